@@ -1,8 +1,22 @@
+import random
 import re
-from typing import Dict, List, Optional, Tuple
+from functools import cache, lru_cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Set, Tuple
 from enum import Enum
-import json
-from datetime import datetime
+import orjson
+
+from .. import queries
+
+# Possessive quantifiers keep these linear: a failed match never re-splits whitespace or digit runs
+_AMOUNT_RE = re.compile(r"(?:rs\.?|₹)?\s*+(\d*+\.\d++|\d++\.?+)\s*+(?:rs\.?|₹)?", re.IGNORECASE)
+_MENU_CHOICE_RE = re.compile(r"general|task|1|2")
+_CANCEL_COMMANDS = frozenset({"menu", "cancel"})
+_GREETINGS = frozenset({"menu", "start", "hi", "hello", "hey", "help"})
+_GREETING_PREFIXES = ("hi ", "hello ", "hey ")
+_CSV_SPLIT_RE = re.compile(r"\s*+,\s*+")
+_CONFIRM = "confirm"
+_TRAVEL_CLASSES = frozenset({"economy", "business", "first"})
 
 class BotState(Enum):
     MENU = "menu"
@@ -49,6 +63,74 @@ class BotState(Enum):
     SETTLE_DEBT_TRANSACTION = "settle_debt_transaction"
 
 
+# Task number or name -> menu option
+_TASK_OPTIONS = {
+    "1": "create_group", "create group": "create_group",
+    "2": "edit_group", "edit group": "edit_group",
+    "3": "plan_group_trip", "plan group trip": "plan_group_trip",
+    "4": "add_event", "add event": "add_event",
+    "5": "plan_solo_trip", "plan solo trip": "plan_solo_trip",
+    "6": "settle_debt", "settle debt": "settle_debt",
+}
+_TASK_RE = re.compile(r"create group|edit group|plan group trip|add event|plan solo trip|settle debt")
+
+
+@lru_cache(maxsize=512)
+def _classify_menu_input(message: str) -> Optional[str]:
+    """Resolve a normalized menu message to the option it selects (pure, so cached)"""
+    if message in _GREETINGS:
+        return "greet"
+    
+    # General wins whenever it is mentioned at all, e.g. "task 1" picks General
+    choices = set(_MENU_CHOICE_RE.findall(message))
+    if choices:
+        return "general" if choices & {"general", "1"} else "task"
+    
+    if message in _TASK_OPTIONS:
+        return _TASK_OPTIONS[message]
+    
+    task_match = _TASK_RE.search(message)
+    if task_match:
+        return _TASK_OPTIONS[task_match.group()]
+    
+    # "hello there" greets, but only once nothing above recognised a choice or task
+    return "greet" if message.startswith(_GREETING_PREFIXES) else None
+
+
+@cache
+def _static_reply(text: str) -> Mapping:
+    """Build a read-only reply that can be shared across turns instead of rebuilt"""
+    return MappingProxyType({"reply": text, "extracted": ()})
+
+
+# Menu option -> (state to enter, reply); None keeps the user on the menu
+_MENU_OPTIONS: Dict[str, Tuple[Optional[BotState], Mapping]] = {
+    "greet": (None, _static_reply("Hello! I'm your Personal Assistant. I can help you around if you so wish for it.\n\nHow may I help you? Choose between one of the below:\n\n1️⃣ General - Chat with me about anything\n2️⃣ Task - Get things done (create groups, plan trips, etc.)")),
+    "general": (BotState.GENERAL_CHAT, _static_reply("Great! I'm here to chat. Feel free to ask me anything or just have a conversation. (Type 'menu' anytime to go back)")),
+    "task": (None, _static_reply("Perfect! Here are the tasks I can help with:\n\n1️⃣ Create Group\n2️⃣ Edit Group\n3️⃣ Plan Group Trip\n4️⃣ Add Event\n5️⃣ Plan Solo Trip\n6️⃣ Settle Debt\n\nType the number or name of the task you want.")),
+    "create_group": (BotState.CREATE_GROUP_NAME, _static_reply("Let's create a new group! What would you like to name this group?")),
+    "edit_group": (BotState.EDIT_GROUP_SELECT, _static_reply("Which group would you like to edit? Please provide the group name.")),
+    "plan_group_trip": (BotState.PLAN_GROUP_TRIP_SELECT, _static_reply("Let's plan a group trip! Which group is this trip for? Please provide the group name.")),
+    "add_event": (BotState.ADD_EVENT_GROUP, _static_reply("I'll help you add an event. Which group is this event for?")),
+    "plan_solo_trip": (BotState.PLAN_SOLO_TRIP_NAME, _static_reply("Exciting! Let's plan your solo trip. What would you like to name this trip?")),
+    "settle_debt": (BotState.SETTLE_DEBT_GROUP, _static_reply("Let's settle a debt. Which group is this for?")),
+}
+_MENU_FALLBACK: Tuple[Optional[BotState], Mapping] = (None, _static_reply("I didn't quite understand. Type 'menu' to see all options."))
+
+_RETURN_TO_MENU_REPLY = _static_reply("Returning to menu...\n\nHow may I help you? Choose between:\n\n1️⃣ General\n2️⃣ Task")
+
+# General-chat replies, with the return-to-menu hint already appended
+_GENERAL_REPLIES = tuple(
+    _static_reply(f"{response}\n\n(Type 'menu' to return to main menu)")
+    for response in (
+        "That's interesting! Tell me more.",
+        "I see. How does that make you feel?",
+        "Fascinating! What else would you like to discuss?",
+        "That's a great point. Anything else on your mind?",
+    )
+)
+
+
 class ExpenseBotLogic:
     """
     Advanced conversational bot with state management and task execution
@@ -56,203 +138,197 @@ class ExpenseBotLogic:
     
     def __init__(self):
         self.gemini_api_key = None  # Set from config if needed
+        # Task flows are grouped by BotState name prefix; resolve each state to its handler once
+        handlers_by_prefix = {
+            "CREATE_GROUP": self._handle_create_group,
+            "EDIT_GROUP": self._handle_edit_group,
+            "PLAN_GROUP_TRIP": self._handle_plan_group_trip,
+            "ADD_EVENT": self._handle_add_event,
+            "PLAN_SOLO_TRIP": self._handle_plan_solo_trip,
+            "SETTLE_DEBT": self._handle_settle_debt,
+        }
+        self._handlers = {
+            state: handler
+            for state in BotState
+            for prefix, handler in handlers_by_prefix.items()
+            if state.name.startswith(prefix)
+        }
     
     async def generate_reply(
         self, 
         user_message: str, 
         user_id: str, 
-        chat_history: List[Dict],
         db_cursor
-    ) -> Dict:
+    ) -> Mapping:
         """Main entry point for generating bot replies"""
         
-        message_lower = user_message.lower().strip()
+        message_clean = user_message.strip()
+        # Normalized once per turn: lowercased with emoji variation selectors removed
+        message_lower = message_clean.lower()
+        if "\ufe0f" in message_lower:
+            message_lower = message_lower.replace("\ufe0f", "").strip()
+        
+        # 'cancel' always lands on the menu, so it needs no state read
+        if message_lower == "cancel":
+            return await self._reset_to_menu(user_id, db_cursor)
         
         # Get current state
         current_state, state_data = await self._get_user_state(user_id, db_cursor)
         
-        # Handle based on state
+        # Handle based on state ('menu' typed at the menu shows the full greeting)
         if current_state == BotState.MENU:
             return await self._handle_menu(message_lower, user_id, db_cursor)
-        elif current_state == BotState.GENERAL_CHAT:
-            return await self._handle_general_chat(user_message, user_id, db_cursor)
+        
+        # 'menu' leaves any flow
+        if message_lower in _CANCEL_COMMANDS:
+            return await self._reset_to_menu(user_id, db_cursor)
+        
+        if current_state == BotState.GENERAL_CHAT:
+            return self._handle_general_chat()
         
         # Task-specific handlers
-        elif current_state.name.startswith("CREATE_GROUP"):
-            return await self._handle_create_group(user_message, current_state, state_data, user_id, db_cursor)
-        elif current_state.name.startswith("EDIT_GROUP"):
-            return await self._handle_edit_group(user_message, current_state, state_data, user_id, db_cursor)
-        elif current_state.name.startswith("PLAN_GROUP_TRIP"):
-            return await self._handle_plan_group_trip(user_message, current_state, state_data, user_id, db_cursor)
-        elif current_state.name.startswith("ADD_EVENT"):
-            return await self._handle_add_event(user_message, current_state, state_data, user_id, db_cursor)
-        elif current_state.name.startswith("PLAN_SOLO_TRIP"):
-            return await self._handle_plan_solo_trip(user_message, current_state, state_data, user_id, db_cursor)
-        elif current_state.name.startswith("SETTLE_DEBT"):
-            return await self._handle_settle_debt(user_message, current_state, state_data, user_id, db_cursor)
+        handler = self._handlers.get(current_state)
+        if handler is not None:
+            return await handler(message_clean, message_lower, current_state, state_data, user_id, db_cursor)
         
         # Default fallback
         return await self._reset_to_menu(user_id, db_cursor)
     
     async def _get_user_state(self, user_id: str, cur) -> Tuple[BotState, Dict]:
         """Get user's current conversation state"""
-        await cur.execute(
-            "SELECT state, state_data FROM ChatbotState WHERE user_id = %s",
-            (user_id,)
-        )
+        await cur.execute(queries.GET_CHATBOT_STATE, (user_id,))
         result = await cur.fetchone()
         
         if result:
             state = BotState(result["state"])
-            state_data = json.loads(result["state_data"]) if result["state_data"] else {}
+            state_data = orjson.loads(result["state_data"]) if result["state_data"] else {}
             return state, state_data
         
-        # Default to menu
-        await self._set_user_state(user_id, BotState.MENU, {}, cur)
+        # No row yet means the user is on the menu; the first transition creates it
         return BotState.MENU, {}
     
     async def _set_user_state(self, user_id: str, state: BotState, data: Dict, cur):
-        """Update user's conversation state"""
+        """Update user's conversation state (committed by the caller along with the turn)"""
         await cur.execute(
-            """
-            INSERT INTO ChatbotState (user_id, state, state_data) 
-            VALUES (%s, %s, %s)
-            ON DUPLICATE KEY UPDATE state = %s, state_data = %s
-            """,
-            (user_id, state.value, json.dumps(data), state.value, json.dumps(data))
+            queries.SET_CHATBOT_STATE,
+            (user_id, state.value, orjson.dumps(data).decode())
         )
-        await cur._connection.commit()
     
-    async def _handle_menu(self, message: str, user_id: str, cur) -> Dict:
+    async def _existing_usernames(self, usernames: List[str], cur) -> Set[str]:
+        """Return which of the given usernames exist, using a single IN query"""
+        placeholders = ", ".join(["%s"] * len(usernames))
+        await cur.execute(
+            queries.GET_EXISTING_USERNAMES.format(placeholders=placeholders),
+            tuple(usernames)
+        )
+        return {row["username"] for row in await cur.fetchall()}
+    
+    async def _clear_user_state(self, user_id: str, cur):
+        """Return the user to the menu (a missing row already reads as the menu)"""
+        await cur.execute(queries.CLEAR_CHATBOT_STATE, (user_id,))
+    
+    async def _handle_menu(self, message: str, user_id: str, cur) -> Mapping:
         """Handle main menu interactions"""
         
-        # First time or returning to menu
-        if message in ["menu", "start", "hi", "hello", "help"]:
-            return {
-                "reply": "Hello! I'm your Personal Assistant. I can help you around if you so wish for it.\n\nHow may I help you? Choose between one of the below:\n\n1️⃣ General - Chat with me about anything\n2️⃣ Task - Get things done (create groups, plan trips, etc.)",
-                "extracted": []
-            }
-        
-        # User chooses General
-        if any(x in message for x in ["general", "1"]):
-            await self._set_user_state(user_id, BotState.GENERAL_CHAT, {}, cur)
-            return {
-                "reply": "Great! I'm here to chat. Feel free to ask me anything or just have a conversation. (Type 'menu' anytime to go back)",
-                "extracted": []
-            }
-        
-        # User chooses Task
-        if any(x in message for x in ["task", "2"]):
-            return {
-                "reply": "Perfect! Here are the tasks I can help with:\n\n1️⃣ Create Group\n2️⃣ Edit Group\n3️⃣ Plan Group Trip\n4️⃣ Add Event\n5️⃣ Plan Solo Trip\n6️⃣ Settle Debt\n\nType the number or name of the task you want.",
-                "extracted": []
-            }
-        
-        # Task selection
-        task_message = message.replace("️", "").strip()  # Remove emoji modifiers
-        
-        if "create group" in task_message or task_message == "1":
-            await self._set_user_state(user_id, BotState.CREATE_GROUP_NAME, {}, cur)
-            return {"reply": "Let's create a new group! What would you like to name this group?", "extracted": []}
-        
-        if "edit group" in task_message or task_message == "2":
-            await self._set_user_state(user_id, BotState.EDIT_GROUP_SELECT, {}, cur)
-            return {"reply": "Which group would you like to edit? Please provide the group name.", "extracted": []}
-        
-        if "plan group trip" in task_message or task_message == "3":
-            await self._set_user_state(user_id, BotState.PLAN_GROUP_TRIP_SELECT, {}, cur)
-            return {"reply": "Let's plan a group trip! Which group is this trip for? Please provide the group name.", "extracted": []}
-        
-        if "add event" in task_message or task_message == "4":
-            await self._set_user_state(user_id, BotState.ADD_EVENT_GROUP, {}, cur)
-            return {"reply": "I'll help you add an event. Which group is this event for?", "extracted": []}
-        
-        if "plan solo trip" in task_message or task_message == "5":
-            await self._set_user_state(user_id, BotState.PLAN_SOLO_TRIP_NAME, {}, cur)
-            return {"reply": "Exciting! Let's plan your solo trip. What would you like to name this trip?", "extracted": []}
-        
-        if "settle debt" in task_message or task_message == "6":
-            await self._set_user_state(user_id, BotState.SETTLE_DEBT_GROUP, {}, cur)
-            return {"reply": "Let's settle a debt. Which group is this for?", "extracted": []}
-        
-        return {
-            "reply": "I didn't quite understand. Type 'menu' to see all options.",
-            "extracted": []
-        }
+        next_state, reply = _MENU_OPTIONS.get(_classify_menu_input(message), _MENU_FALLBACK)
+        if next_state is not None:
+            await self._set_user_state(user_id, next_state, {}, cur)
+        return reply
     
-    async def _handle_general_chat(self, message: str, user_id: str, cur) -> Dict:
+    def _handle_general_chat(self) -> Mapping:
         """Handle general conversation"""
         
-        if message.lower() == "menu":
-            return await self._reset_to_menu(user_id, cur)
-        
         # Simple conversational responses
         # TODO: Integrate with Gemini/GPT API here
-        responses = [
-            "That's interesting! Tell me more.",
-            "I see. How does that make you feel?",
-            "Fascinating! What else would you like to discuss?",
-            "That's a great point. Anything else on your mind?"
-        ]
-        
-        import random
-        return {
-            "reply": random.choice(responses) + "\n\n(Type 'menu' to return to main menu)",
-            "extracted": []
-        }
+        return random.choice(_GENERAL_REPLIES)
     
-    async def _handle_create_group(self, message: str, state: BotState, data: Dict, user_id: str, cur) -> Dict:
+    async def _handle_create_group(self, message_clean: str, message_lower: str, state: BotState, data: Dict, user_id: str, cur) -> Mapping:
         """Handle group creation flow"""
         
-        message_clean = message.strip()
-        
-        if message_clean.lower() in ["menu", "cancel"]:
-            return await self._reset_to_menu(user_id, cur)
-        
         if state == BotState.CREATE_GROUP_NAME:
             # Validate group name uniqueness
-            await cur.execute("SELECT * FROM `Group` WHERE group_name = %s", (message_clean,))
+            await cur.execute(queries.GROUP_EXISTS, (message_clean,))
             if await cur.fetchone():
-                return {"reply": "❌ That group name is already taken. Please choose another name:", "extracted": []}
+                return _static_reply("❌ That group name is already taken. Please choose another name:")
             
             data["group_name"] = message_clean
             await self._set_user_state(user_id, BotState.CREATE_GROUP_MEMBERS, data, cur)
             return {"reply": f"Great! Group '{message_clean}' it is.\n\nNow, who should be members of this group? Please provide usernames separated by commas (e.g., user1, user2, user3)", "extracted": []}
         
-        elif state == BotState.PLAN_SOLO_TRIP_CONFIRM:
-            if message_clean.lower() == "confirm":
-                await self._set_user_state(user_id, BotState.MENU, {}, cur)
-                return {
-                    "reply": f"✅ Solo trip '{data['trip_name']}' will be created! Visit /plan-solo-trip page to complete with exact destinations.\n\nType 'menu' for more.",
-                    "action": "redirect_trip_planning",
-                    "data": {"userId": user_id, "isSolo": True},
-                    "extracted": []
-                }
+        elif state == BotState.CREATE_GROUP_MEMBERS:
+            members = [m for m in _CSV_SPLIT_RE.split(message_clean) if m]
+            
+            if not members:
+                return _static_reply("Please provide at least one member:")
+            
+            # Validate all members in one round trip
+            found = await self._existing_usernames(members, cur)
+            invalid_members = [m for m in members if m not in found]
+            
+            if invalid_members:
+                return {"reply": f"❌ These users don't exist: {', '.join(invalid_members)}\n\nPlease provide valid usernames:", "extracted": []}
+            
+            data["members"] = members
+            await self._set_user_state(user_id, BotState.CREATE_GROUP_DURATION, data, cur)
+            return _static_reply("Perfect! How long is this group for? (e.g., '1 week', '1 month', or type 'skip')")
+        
+        elif state == BotState.CREATE_GROUP_DURATION:
+            duration = "" if message_lower == "skip" else message_clean
+            data["duration"] = duration
+            
+            await self._set_user_state(user_id, BotState.CREATE_GROUP_CONFIRM, data, cur)
+            return {
+                "reply": f"📋 Summary:\n\nGroup Name: {data['group_name']}\nMembers: {', '.join(data['members'])}\nDuration: {duration or 'Not specified'}\n\nType 'confirm' to create this group or 'cancel' to abort.",
+                "extracted": []
+            }
+        
+        elif state == BotState.CREATE_GROUP_CONFIRM:
+            if message_lower == _CONFIRM:
+                # Create the group
+                try:
+                    await cur.execute(
+                        queries.CREATE_GROUP,
+                        (data["group_name"], user_id, data.get("duration", ""))
+                    )
+                    
+                    # Add creator if not in members
+                    members = data["members"]
+                    if user_id not in members:
+                        members.append(user_id)
+                    
+                    # Add all members in a single multi-row insert
+                    await cur.executemany(
+                        queries.ADD_GROUP_MEMBER,
+                        [(data["group_name"], member) for member in members]
+                    )
+                    
+                    await self._clear_user_state(user_id, cur)
+                    return {
+                        "reply": f"✅ Group '{data['group_name']}' created successfully!\n\nType 'menu' to see what else I can help with.",
+                        "extracted": []
+                    }
+                except Exception as e:
+                    await cur._connection.rollback()
+                    return {"reply": f"❌ Error creating group: {str(e)}\n\nType 'menu' to return.", "extracted": []}
             else:
                 return await self._reset_to_menu(user_id, cur)
         
-        return {"reply": "Error. Type 'menu'.", "extracted": []}
+        return _static_reply("Error. Type 'menu'.")
     
-    async def _handle_settle_debt(self, message: str, state: BotState, data: Dict, user_id: str, cur) -> Dict:
+    async def _handle_settle_debt(self, message_clean: str, message_lower: str, state: BotState, data: Dict, user_id: str, cur) -> Mapping:
         """Handle debt settlement"""
         
-        message_clean = message.strip()
-        
-        if message_clean.lower() in ["menu", "cancel"]:
-            return await self._reset_to_menu(user_id, cur)
-        
         if state == BotState.SETTLE_DEBT_GROUP:
-            # Check group exists
-            await cur.execute("SELECT * FROM `Group` WHERE group_name = %s", (message_clean,))
-            if not await cur.fetchone():
-                return {"reply": "❌ Group not found. Try again or type 'menu':", "extracted": []}
+            # Group existence and its events in one round trip; no rows means no group
+            await cur.execute(queries.GET_GROUP_EVENT_NAMES, (message_clean,))
+            rows = await cur.fetchall()
+            if not rows:
+                return _static_reply("❌ Group not found. Try again or type 'menu':")
             
             data["group_name"] = message_clean
             await self._set_user_state(user_id, BotState.SETTLE_DEBT_EVENT, data, cur)
             
-            # Show events in this group
-            await cur.execute("SELECT event_name FROM Event WHERE group_name = %s", (message_clean,))
-            events = await cur.fetchall()
+            events = [r for r in rows if r["event_name"]]
             
             if not events:
                 return {"reply": f"No events found in group '{message_clean}'.\n\nType 'menu' to return.", "extracted": []}
@@ -262,15 +338,11 @@ class ExpenseBotLogic:
         
         elif state == BotState.SETTLE_DEBT_EVENT:
             # Check event exists
-            await cur.execute(
-                "SELECT * FROM Event WHERE group_name = %s AND event_name = %s",
-                (data["group_name"], message_clean)
-            )
+            await cur.execute(queries.EVENT_EXISTS, (data["group_name"], message_clean))
             if not await cur.fetchone():
-                return {"reply": "❌ Event not found. Try again:", "extracted": []}
+                return _static_reply("❌ Event not found. Try again:")
             
             data["event_name"] = message_clean
-            await self._set_user_state(user_id, BotState.SETTLE_DEBT_TRANSACTION, data, cur)
             
             # Show unpaid transactions
             await cur.execute(
@@ -282,31 +354,25 @@ class ExpenseBotLogic:
                 JOIN User u1 ON t.owed_by = u1.username
                 JOIN User u2 ON t.owed_to = u2.username
                 WHERE t.group_name = %s AND t.event_name = %s AND t.is_paid = 0
+                  AND (t.owed_by = %s OR t.owed_to = %s)
                 """,
-                (data["group_name"], message_clean)
+                (data["group_name"], message_clean, user_id, user_id)
             )
-            transactions = await cur.fetchall()
-            
-            if not transactions:
-                return {"reply": f"No unpaid transactions in '{message_clean}'.\n\nType 'menu' to return.", "extracted": []}
-            
-            # Filter transactions where user is involved
-            user_transactions = [
-                t for t in transactions 
-                if t['owed_by'] == user_id or t['owed_to'] == user_id
-            ]
+            user_transactions = await cur.fetchall()
             
             if not user_transactions:
                 return {"reply": f"You have no pending transactions in this event.\n\nType 'menu' to return.", "extracted": []}
             
+            # Only the ids are kept in state; the chosen row is re-read next turn
+            data["transaction_ids"] = [t["transaction_id"] for t in user_transactions]
+            await self._set_user_state(user_id, BotState.SETTLE_DEBT_TRANSACTION, data, cur)
+            
             txn_list = []
             for i, t in enumerate(user_transactions, 1):
                 txn_list.append(
                     f"{i}. ₹{t['amount']} - {t['owed_by_first']} {t['owed_by_last']} → {t['owed_to_first']} {t['owed_to_last']}\n   Reason: {t['reason']}"
                 )
             
-            data["transactions"] = user_transactions
-            
             return {
                 "reply": f"Your pending transactions:\n\n" + "\n\n".join(txn_list) + f"\n\nType the number to settle (1-{len(user_transactions)}):",
                 "extracted": []
@@ -315,15 +381,22 @@ class ExpenseBotLogic:
         elif state == BotState.SETTLE_DEBT_TRANSACTION:
             try:
                 choice = int(message_clean)
-                if choice < 1 or choice > len(data["transactions"]):
-                    return {"reply": f"❌ Invalid choice. Enter 1-{len(data['transactions'])}:", "extracted": []}
+                if choice < 1 or choice > len(data["transaction_ids"]):
+                    return {"reply": f"❌ Invalid choice. Enter 1-{len(data['transaction_ids'])}:", "extracted": []}
                 
-                txn = data["transactions"][choice - 1]
+                # Re-check it is still unpaid and still the user's, since it was listed on an earlier turn
+                await cur.execute(
+                    queries.GET_UNPAID_TRANSACTION_FOR_USER,
+                    (data["transaction_ids"][choice - 1], user_id)
+                )
+                txn = await cur.fetchone()
+                if not txn:
+                    return _static_reply("❌ That transaction is no longer pending. Type 'menu' to start over.")
                 
                 # Generate receipt upload URL
                 receipt_url = f"/receipt_upload?groupName={data['group_name']}&eventName={data['event_name']}&timestamp={txn['timestamp']}&owedBy={txn['owed_by']}&owedTo={txn['owed_to']}"
                 
-                await self._set_user_state(user_id, BotState.MENU, {}, cur)
+                await self._clear_user_state(user_id, cur)
                 
                 return {
                     "reply": f"✅ Please upload receipt for:\n\n₹{txn['amount']} - {txn['reason']}\n\nClick the link to upload receipt and mark as paid.\n\nType 'menu' when done.",
@@ -332,36 +405,23 @@ class ExpenseBotLogic:
                     "extracted": []
                 }
             except ValueError:
-                return {"reply": "❌ Please enter a number:", "extracted": []}
+                return _static_reply("❌ Please enter a number:")
         
-        return {"reply": "Error. Type 'menu'.", "extracted": []}
+        return _static_reply("Error. Type 'menu'.")
     
-    async def _reset_to_menu(self, user_id: str, cur) -> Dict:
+    async def _reset_to_menu(self, user_id: str, cur) -> Mapping:
         """Reset user to main menu"""
-        await self._set_user_state(user_id, BotState.MENU, {}, cur)
-        return {
-            "reply": "Returning to menu...\n\nHow may I help you? Choose between:\n\n1️⃣ General\n2️⃣ Task",
-            "extracted": []
-        }
+        await self._clear_user_state(user_id, cur)
+        return _RETURN_TO_MENU_REPLY
     
-    async def _handle_edit_group(self, message: str, state: BotState, data: Dict, user_id: str, cur) -> Dict:
+    async def _handle_edit_group(self, message_clean: str, message_lower: str, state: BotState, data: Dict, user_id: str, cur) -> Mapping:
         """Handle group editing flow"""
         
-        message_clean = message.strip()
-        
-        if message_clean.lower() in ["menu", "cancel"]:
-            return await self._reset_to_menu(user_id, cur)
-        
         if state == BotState.EDIT_GROUP_SELECT:
-            # Check if group exists and user is creator
-            await cur.execute(
-                "SELECT * FROM `Group` WHERE group_name = %s AND created_by = %s",
-                (message_clean, user_id)
-            )
-            group = await cur.fetchone()
-            
-            if not group:
-                return {"reply": "❌ Group not found or you're not the creator. Please try again or type 'menu':", "extracted": []}
+            # Only an ownership check: the members are read when the edit is applied, so they are never stale
+            await cur.execute(queries.GROUP_OWNED_BY_EXISTS, (message_clean, user_id))
+            if not await cur.fetchone():
+                return _static_reply("❌ Group not found or you're not the creator. Please try again or type 'menu':")
             
             data["group_name"] = message_clean
             await self._set_user_state(user_id, BotState.EDIT_GROUP_CHOICE, data, cur)
@@ -371,21 +431,21 @@ class ExpenseBotLogic:
             }
         
         elif state == BotState.EDIT_GROUP_CHOICE:
-            choice = message_clean.lower().replace("️", "").strip()
+            choice = message_lower
             if "name" in choice or choice == "1":
                 await self._set_user_state(user_id, BotState.EDIT_GROUP_NAME, data, cur)
-                return {"reply": "What should the new name be?", "extracted": []}
+                return _static_reply("What should the new name be?")
             elif "member" in choice or choice == "2":
                 await self._set_user_state(user_id, BotState.EDIT_GROUP_MEMBERS, data, cur)
-                return {"reply": "Please provide the updated list of members (comma-separated usernames):", "extracted": []}
+                return _static_reply("Please provide the updated list of members (comma-separated usernames):")
             else:
-                return {"reply": "Please choose '1' for Name or '2' for Members:", "extracted": []}
+                return _static_reply("Please choose '1' for Name or '2' for Members:")
         
         elif state == BotState.EDIT_GROUP_NAME:
             # Check new name availability
-            await cur.execute("SELECT * FROM `Group` WHERE group_name = %s", (message_clean,))
+            await cur.execute(queries.GROUP_EXISTS, (message_clean,))
             if await cur.fetchone():
-                return {"reply": "❌ That name is taken. Choose another:", "extracted": []}
+                return _static_reply("❌ That name is taken. Choose another:")
             
             try:
                 # Update group name (this is tricky with foreign keys, might need to be handled differently)
@@ -393,86 +453,92 @@ class ExpenseBotLogic:
                     "UPDATE `Group` SET group_name = %s WHERE group_name = %s AND created_by = %s",
                     (message_clean, data["group_name"], user_id)
                 )
-                await cur._connection.commit()
-                
-                await self._set_user_state(user_id, BotState.MENU, {}, cur)
+                await self._clear_user_state(user_id, cur)
                 return {"reply": f"✅ Group renamed to '{message_clean}'!\n\nType 'menu' for more options.", "extracted": []}
             except Exception as e:
+                await cur._connection.rollback()
                 return {"reply": f"❌ Error: {str(e)}\n\nType 'menu' to return.", "extracted": []}
         
         elif state == BotState.EDIT_GROUP_MEMBERS:
-            members = [m.strip() for m in message_clean.split(",") if m.strip()]
+            members = [m for m in _CSV_SPLIT_RE.split(message_clean) if m]
             
-            # Validate members
-            invalid = []
-            for member in members:
-                await cur.execute("SELECT username FROM User WHERE username = %s", (member,))
-                if not await cur.fetchone():
-                    invalid.append(member)
+            if not members:
+                return _static_reply("Please provide at least one member:")
+            
+            # Diff against the members as they are now, not as they were when the flow started
+            await cur.execute(queries.GET_OWNED_GROUP_MEMBERS, (data["group_name"], user_id))
+            rows = await cur.fetchall()
+            if not rows:
+                await self._clear_user_state(user_id, cur)
+                return _static_reply("❌ Group not found or you're not the creator. Type 'menu' to start over.")
+            existing = {r["username"] for r in rows if r["username"]}
+            
+            # Current members are known to exist; validate the rest in one round trip
+            found = set(existing)
+            unknown = [m for m in members if m not in found]
+            if unknown:
+                found |= await self._existing_usernames(unknown, cur)
+            invalid = [m for m in members if m not in found]
             
             if invalid:
                 return {"reply": f"❌ Invalid users: {', '.join(invalid)}\n\nPlease try again:", "extracted": []}
             
             try:
-                # Delete old members
-                await cur.execute(
-                    "DELETE FROM GroupMember WHERE group_name = %s",
-                    (data["group_name"],)
-                )
-                
-                # Add new members
-                if user_id not in members:
-                    members.append(user_id)
+                # Only write the difference against the current members; the creator always stays
+                target = set(members) | {user_id}
+                to_remove = tuple(existing - target)
+                to_add = [m for m in dict.fromkeys([*members, user_id]) if m not in existing]
                 
-                for member in members:
+                if to_remove:
+                    placeholders = ", ".join(["%s"] * len(to_remove))
                     await cur.execute(
-                        "INSERT INTO GroupMember (group_name, user_id) VALUES (%s, %s)",
-                        (data["group_name"], member)
+                        queries.REMOVE_GROUP_MEMBERS.format(placeholders=placeholders),
+                        (data["group_name"], *to_remove)
                     )
                 
-                await cur._connection.commit()
+                if to_add:
+                    await cur.executemany(
+                        queries.ADD_GROUP_MEMBER,
+                        [(data["group_name"], member) for member in to_add]
+                    )
                 
-                await self._set_user_state(user_id, BotState.MENU, {}, cur)
+                await self._clear_user_state(user_id, cur)
                 return {"reply": f"✅ Members updated!\n\nType 'menu' for more.", "extracted": []}
             except Exception as e:
+                await cur._connection.rollback()
                 return {"reply": f"❌ Error: {str(e)}\n\nType 'menu'.", "extracted": []}
         
-        return {"reply": "Error. Type 'menu'.", "extracted": []}
+        return _static_reply("Error. Type 'menu'.")
     
-    async def _handle_plan_group_trip(self, message: str, state: BotState, data: Dict, user_id: str, cur) -> Dict:
+    async def _handle_plan_group_trip(self, message_clean: str, message_lower: str, state: BotState, data: Dict, user_id: str, cur) -> Mapping:
         """Handle group trip planning"""
         
-        message_clean = message.strip()
-        
-        if message_clean.lower() in ["menu", "cancel"]:
-            return await self._reset_to_menu(user_id, cur)
-        
         if state == BotState.PLAN_GROUP_TRIP_SELECT:
             # Verify group exists
-            await cur.execute("SELECT * FROM `Group` WHERE group_name = %s", (message_clean,))
+            await cur.execute(queries.GROUP_EXISTS, (message_clean,))
             if not await cur.fetchone():
-                return {"reply": "❌ Group not found. Try again or type 'menu':", "extracted": []}
+                return _static_reply("❌ Group not found. Try again or type 'menu':")
             
             data["group_name"] = message_clean
             await self._set_user_state(user_id, BotState.PLAN_GROUP_TRIP_NAME, data, cur)
-            return {"reply": "What should we name this trip?", "extracted": []}
+            return _static_reply("What should we name this trip?")
         
         elif state == BotState.PLAN_GROUP_TRIP_NAME:
             data["trip_name"] = message_clean
             await self._set_user_state(user_id, BotState.PLAN_GROUP_TRIP_CITIES, data, cur)
-            return {"reply": "Great! Now list the cities you want to visit (comma-separated, e.g., Paris, London, Rome):", "extracted": []}
+            return _static_reply("Great! Now list the cities you want to visit (comma-separated, e.g., Paris, London, Rome):")
         
         elif state == BotState.PLAN_GROUP_TRIP_CITIES:
-            cities = [c.strip() for c in message_clean.split(",") if c.strip()]
+            cities = [c for c in _CSV_SPLIT_RE.split(message_clean) if c]
             if len(cities) < 2:
-                return {"reply": "❌ Please provide at least 2 cities:", "extracted": []}
+                return _static_reply("❌ Please provide at least 2 cities:")
             
             data["cities"] = cities
             await self._set_user_state(user_id, BotState.PLAN_GROUP_TRIP_CLASS, data, cur)
-            return {"reply": "What travel class? Type:\n• economy\n• business\n• first", "extracted": []}
+            return _static_reply("What travel class? Type:\n• economy\n• business\n• first")
         
         elif state == BotState.PLAN_GROUP_TRIP_CLASS:
-            travel_class = message_clean.lower() if message_clean.lower() in ["economy", "business", "first"] else "economy"
+            travel_class = message_lower if message_lower in _TRAVEL_CLASSES else "economy"
             data["travel_class"] = travel_class
             
             await self._set_user_state(user_id, BotState.PLAN_GROUP_TRIP_CONFIRM, data, cur)
@@ -482,8 +548,8 @@ class ExpenseBotLogic:
             }
         
         elif state == BotState.PLAN_GROUP_TRIP_CONFIRM:
-            if message_clean.lower() == "confirm":
-                await self._set_user_state(user_id, BotState.MENU, {}, cur)
+            if message_lower == _CONFIRM:
+                await self._clear_user_state(user_id, cur)
                 return {
                     "reply": f"✅ Trip '{data['trip_name']}' will be created! You can visit /plan-group-trip page to complete the planning with exact destinations.\n\nType 'menu' for more.",
                     "action": "redirect_trip_planning",
@@ -493,73 +559,66 @@ class ExpenseBotLogic:
             else:
                 return await self._reset_to_menu(user_id, cur)
         
-        return {"reply": "Error. Type 'menu'.", "extracted": []}
+        return _static_reply("Error. Type 'menu'.")
     
-    async def _handle_add_event(self, message: str, state: BotState, data: Dict, user_id: str, cur) -> Dict:
+    async def _handle_add_event(self, message_clean: str, message_lower: str, state: BotState, data: Dict, user_id: str, cur) -> Mapping:
         """Handle event addition"""
         
-        message_clean = message.strip()
-        
-        if message_clean.lower() in ["menu", "cancel"]:
-            return await self._reset_to_menu(user_id, cur)
-        
         if state == BotState.ADD_EVENT_GROUP:
             # Check group exists
-            await cur.execute("SELECT * FROM `Group` WHERE group_name = %s", (message_clean,))
+            await cur.execute(queries.GROUP_EXISTS, (message_clean,))
             if not await cur.fetchone():
-                return {"reply": "❌ Group not found. Try again or type 'menu':", "extracted": []}
+                return _static_reply("❌ Group not found. Try again or type 'menu':")
             
             data["group_name"] = message_clean
             await self._set_user_state(user_id, BotState.ADD_EVENT_NAME, data, cur)
-            return {"reply": "What's the event name?", "extracted": []}
+            return _static_reply("What's the event name?")
         
         elif state == BotState.ADD_EVENT_NAME:
             # Check unique event name
-            await cur.execute(
-                "SELECT * FROM Event WHERE group_name = %s AND event_name = %s",
-                (data["group_name"], message_clean)
-            )
+            await cur.execute(queries.EVENT_EXISTS, (data["group_name"], message_clean))
             if await cur.fetchone():
-                return {"reply": "❌ Event name must be unique. Choose another:", "extracted": []}
+                return _static_reply("❌ Event name must be unique. Choose another:")
             
             data["event_name"] = message_clean
             await self._set_user_state(user_id, BotState.ADD_EVENT_DESCRIPTION, data, cur)
-            return {"reply": "Provide a brief description (or type 'skip'):", "extracted": []}
+            return _static_reply("Provide a brief description (or type 'skip'):")
         
         elif state == BotState.ADD_EVENT_DESCRIPTION:
-            data["description"] = "" if message_clean.lower() == "skip" else message_clean
+            data["description"] = "" if message_lower == "skip" else message_clean
             await self._set_user_state(user_id, BotState.ADD_EVENT_AMOUNT, data, cur)
-            return {"reply": "What's the amount?", "extracted": []}
+            return _static_reply("What's the amount?")
         
         elif state == BotState.ADD_EVENT_AMOUNT:
-            try:
-                amount = float(message_clean)
-                data["amount"] = amount
-                await self._set_user_state(user_id, BotState.ADD_EVENT_OWED_BY, data, cur)
-                return {"reply": "Who owes this money? (username)", "extracted": []}
-            except:
-                return {"reply": "❌ Invalid amount. Please enter a number:", "extracted": []}
+            amount_match = _AMOUNT_RE.fullmatch(message_clean)
+            if not amount_match:
+                return _static_reply("❌ Invalid amount. Please enter a number:")
+            
+            # A plain decimal string; the DECIMAL(10, 2) column rounds extra fraction digits on insert
+            data["amount"] = amount_match.group(1)
+            await self._set_user_state(user_id, BotState.ADD_EVENT_OWED_BY, data, cur)
+            return _static_reply("Who owes this money? (username)")
         
         elif state == BotState.ADD_EVENT_OWED_BY:
-            await cur.execute("SELECT username FROM User WHERE username = %s", (message_clean,))
+            await cur.execute(queries.USER_EXISTS, (message_clean,))
             if not await cur.fetchone():
-                return {"reply": "❌ User not found. Try again:", "extracted": []}
+                return _static_reply("❌ User not found. Try again:")
             
             data["owed_by"] = message_clean
             await self._set_user_state(user_id, BotState.ADD_EVENT_OWED_TO, data, cur)
-            return {"reply": "Who should receive this money? (username)", "extracted": []}
+            return _static_reply("Who should receive this money? (username)")
         
         elif state == BotState.ADD_EVENT_OWED_TO:
-            await cur.execute("SELECT username FROM User WHERE username = %s", (message_clean,))
+            await cur.execute(queries.USER_EXISTS, (message_clean,))
             if not await cur.fetchone():
-                return {"reply": "❌ User not found. Try again:", "extracted": []}
+                return _static_reply("❌ User not found. Try again:")
             
             if message_clean == data["owed_by"]:
-                return {"reply": "❌ Users can't owe themselves! Try again:", "extracted": []}
+                return _static_reply("❌ Users can't owe themselves! Try again:")
             
             data["owed_to"] = message_clean
             await self._set_user_state(user_id, BotState.ADD_EVENT_REASON, data, cur)
-            return {"reply": "What's the reason for this transaction?", "extracted": []}
+            return _static_reply("What's the reason for this transaction?")
         
         elif state == BotState.ADD_EVENT_REASON:
             data["reason"] = message_clean
@@ -570,7 +629,7 @@ class ExpenseBotLogic:
             }
         
         elif state == BotState.ADD_EVENT_CONFIRM:
-            if message_clean.lower() == "confirm":
+            if message_lower == _CONFIRM:
                 try:
                     # Create event
                     await cur.execute(
@@ -580,45 +639,39 @@ class ExpenseBotLogic:
                     
                     # Create transaction
                     await cur.execute(
-                        "INSERT INTO Transaction (group_name, event_name, created_by, owed_by, owed_to, amount, reason, timestamp) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                        (data["group_name"], data["event_name"], user_id, data["owed_by"], data["owed_to"], data["amount"], data["reason"], datetime.now())
+                        queries.CREATE_TRANSACTION,
+                        (data["group_name"], data["event_name"], user_id, data["owed_by"], data["owed_to"], data["amount"], data["reason"])
                     )
                     
-                    await cur._connection.commit()
-                    
-                    await self._set_user_state(user_id, BotState.MENU, {}, cur)
-                    return {"reply": "✅ Event created successfully!\n\nType 'menu' for more.", "extracted": []}
+                    await self._clear_user_state(user_id, cur)
+                    return _static_reply("✅ Event created successfully!\n\nType 'menu' for more.")
                 except Exception as e:
+                    await cur._connection.rollback()
                     return {"reply": f"❌ Error: {str(e)}\n\nType 'menu'.", "extracted": []}
             else:
                 return await self._reset_to_menu(user_id, cur)
         
-        return {"reply": "Error. Type 'menu'.", "extracted": []}
+        return _static_reply("Error. Type 'menu'.")
     
-    async def _handle_plan_solo_trip(self, message: str, state: BotState, data: Dict, user_id: str, cur) -> Dict:
+    async def _handle_plan_solo_trip(self, message_clean: str, message_lower: str, state: BotState, data: Dict, user_id: str, cur) -> Mapping:
         """Handle solo trip planning"""
         
-        message_clean = message.strip()
-        
-        if message_clean.lower() in ["menu", "cancel"]:
-            return await self._reset_to_menu(user_id, cur)
-        
         if state == BotState.PLAN_SOLO_TRIP_NAME:
             data["trip_name"] = message_clean
             await self._set_user_state(user_id, BotState.PLAN_SOLO_TRIP_CITIES, data, cur)
-            return {"reply": "List the cities you want to visit (comma-separated, e.g., Tokyo, Seoul, Bangkok):", "extracted": []}
+            return _static_reply("List the cities you want to visit (comma-separated, e.g., Tokyo, Seoul, Bangkok):")
         
         elif state == BotState.PLAN_SOLO_TRIP_CITIES:
-            cities = [c.strip() for c in message_clean.split(",") if c.strip()]
+            cities = [c for c in _CSV_SPLIT_RE.split(message_clean) if c]
             if len(cities) < 2:
-                return {"reply": "❌ Please provide at least 2 cities:", "extracted": []}
+                return _static_reply("❌ Please provide at least 2 cities:")
             
             data["cities"] = cities
             await self._set_user_state(user_id, BotState.PLAN_SOLO_TRIP_CLASS, data, cur)
-            return {"reply": "What travel class? Type:\n• economy\n• business\n• first", "extracted": []}
+            return _static_reply("What travel class? Type:\n• economy\n• business\n• first")
         
         elif state == BotState.PLAN_SOLO_TRIP_CLASS:
-            travel_class = message_clean.lower() if message_clean.lower() in ["economy", "business", "first"] else "economy"
+            travel_class = message_lower if message_lower in _TRAVEL_CLASSES else "economy"
             data["travel_class"] = travel_class
             
             await self._set_user_state(user_id, BotState.PLAN_SOLO_TRIP_CONFIRM, data, cur)
@@ -627,67 +680,16 @@ class ExpenseBotLogic:
                 "extracted": []
             }
         
-        elif state == BotState.CREATE_GROUP_MEMBERS:
-            members = [m.strip() for m in message_clean.split(",") if m.strip()]
-            
-            if not members:
-                return {"reply": "Please provide at least one member:", "extracted": []}
-            
-            # Validate all members exist
-            invalid_members = []
-            for member in members:
-                await cur.execute("SELECT username FROM User WHERE username = %s", (member,))
-                if not await cur.fetchone():
-                    invalid_members.append(member)
-            
-            if invalid_members:
-                return {"reply": f"❌ These users don't exist: {', '.join(invalid_members)}\n\nPlease provide valid usernames:", "extracted": []}
-            
-            data["members"] = members
-            await self._set_user_state(user_id, BotState.CREATE_GROUP_DURATION, data, cur)
-            return {"reply": "Perfect! How long is this group for? (e.g., '1 week', '1 month', or type 'skip')", "extracted": []}
-        
-        elif state == BotState.CREATE_GROUP_DURATION:
-            duration = "" if message_clean.lower() == "skip" else message_clean
-            data["duration"] = duration
-            
-            await self._set_user_state(user_id, BotState.CREATE_GROUP_CONFIRM, data, cur)
-            return {
-                "reply": f"📋 Summary:\n\nGroup Name: {data['group_name']}\nMembers: {', '.join(data['members'])}\nDuration: {duration or 'Not specified'}\n\nType 'confirm' to create this group or 'cancel' to abort.",
-                "extracted": []
-            }
-        
-        elif state == BotState.CREATE_GROUP_CONFIRM:
-            if message_clean.lower() == "confirm":
-                # Create the group
-                try:
-                    await cur.execute(
-                        "INSERT INTO `Group` (group_name, created_by, duration) VALUES (%s, %s, %s)",
-                        (data["group_name"], user_id, data.get("duration", ""))
-                    )
-                    
-                    # Add creator if not in members
-                    members = data["members"]
-                    if user_id not in members:
-                        members.append(user_id)
-                    
-                    # Add all members
-                    for member in members:
-                        await cur.execute(
-                            "INSERT INTO GroupMember (group_name, user_id) VALUES (%s, %s)",
-                            (data["group_name"], member)
-                        )
-                    
-                    await cur._connection.commit()
-                    
-                    await self._set_user_state(user_id, BotState.MENU, {}, cur)
-                    return {
-                        "reply": f"✅ Group '{data['group_name']}' created successfully!\n\nType 'menu' to see what else I can help with.",
-                        "extracted": []
-                    }
-                except Exception as e:
-                    return {"reply": f"❌ Error creating group: {str(e)}\n\nType 'menu' to return.", "extracted": []}
+        elif state == BotState.PLAN_SOLO_TRIP_CONFIRM:
+            if message_lower == _CONFIRM:
+                await self._clear_user_state(user_id, cur)
+                return {
+                    "reply": f"✅ Solo trip '{data['trip_name']}' will be created! Visit /plan-solo-trip page to complete with exact destinations.\n\nType 'menu' for more.",
+                    "action": "redirect_trip_planning",
+                    "data": {"userId": user_id, "isSolo": True},
+                    "extracted": []
+                }
             else:
                 return await self._reset_to_menu(user_id, cur)
         
-        return {"reply": "Something went wrong. Type 'menu' to start over.", "extracted": []}
\ No newline at end of file
+        return _static_reply("Something went wrong. Type 'menu' to start over.")
\ No newline at end of file
@@ -1,57 +1,80 @@
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from fastapi.responses import ORJSONResponse
 from typing import Annotated
+import orjson
 
-from ..db import get_db, Cur
+from ..db import get_db, Cur, ConnectionPool
 from .. import queries
 from .bot_logic import ExpenseBotLogic
 
-router = APIRouter(prefix="/api/chatbot", tags=["chatbot"])
+router = APIRouter(prefix="/api/chatbot", tags=["chatbot"], default_response_class=ORJSONResponse)
 bot_logic = ExpenseBotLogic()
 
 
+async def _save_turn(pool: ConnectionPool, username: str, message: str, reply: str, extracted):
+    """Persist a turn's chat log and extracted info after the reply has been sent"""
+    try:
+        async with pool.connection() as db:
+            cur = await db.cursor()
+            try:
+                # Both sides of the turn in one multi-row insert
+                await cur.executemany(
+                    queries.SAVE_CHAT_MESSAGE,
+                    [(username, "user", message), (username, "bot", reply)]
+                )
+                
+                # Extracted information, batched into one insert
+                if extracted:
+                    await cur.executemany(
+                        queries.SAVE_EXTRACTED_INFO,
+                        [
+                            (username, item.get("category", "unknown"), item.get("value", ""), item.get("context", ""))
+                            for item in extracted
+                        ]
+                    )
+                
+                await db.commit()
+            finally:
+                await cur.close()
+    except Exception as e:
+        print(f"Error saving chat turn: {e}")
+
+
 @router.post("/send")
 async def send_message(
     req: Request,
-    cur: Annotated[Cur, Depends(get_db)]
+    background_tasks: BackgroundTasks,
+    # Function scope returns the connection before the response is sent, so
+    # _save_turn's own checkout never waits on a connection this request still holds
+    cur: Annotated[Cur, Depends(get_db, scope="function")]
 ):
     """Handle incoming chat messages with state management"""
-    data = await req.json()
+    data = orjson.loads(await req.body())
     username = data.get("userId")
     message = data.get("message", "").strip()
     
     if not username or not message:
-        return JSONResponse(
+        return ORJSONResponse(
             {"error": "userId and message are required"},
             status_code=400
         )
     
     try:
-        # Save user message
-        await cur.execute(queries.SAVE_CHAT_MESSAGE, (username, "user", message))
-        
-        # Get recent chat history for context
-        await cur.execute(queries.GET_CHAT_HISTORY, (username, 10))
-        history = await cur.fetchall()
-        
         # Generate bot reply with state management (pass cursor)
-        bot_response = await bot_logic.generate_reply(message, username, history, cur)
-        
-        # Save bot message
-        await cur.execute(queries.SAVE_CHAT_MESSAGE, (username, "bot", bot_response["reply"]))
-        
-        # Save extracted information if any
-        for item in bot_response.get("extracted", []):
-            await cur.execute(
-                queries.SAVE_EXTRACTED_INFO,
-                (username, item.get("category", "unknown"), item.get("value", ""), item.get("context", ""))
-            )
+        bot_response = await bot_logic.generate_reply(message, username, cur)
         
+        # The state change must be durable before the next turn reads it
         await cur._connection.commit()
         
+        # The chat log is only read back by /history, so it is written after responding
+        extracted = bot_response.get("extracted", [])
+        background_tasks.add_task(
+            _save_turn, req.app.state.pool, username, message, bot_response["reply"], extracted
+        )
+        
         response_data = {
             "reply": bot_response["reply"],
-            "extracted": bot_response.get("extracted", [])
+            "extracted": extracted
         }
         
         # If there's an action to perform
@@ -59,13 +82,13 @@ async def send_message(
             response_data["action"] = bot_response["action"]
             response_data["action_data"] = bot_response.get("data", {})
         
-        return JSONResponse(response_data)
+        return ORJSONResponse(response_data)
         
     except Exception as e:
         print(f"Error in chatbot send: {e}")
         import traceback
         traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 
 @router.get("/history")
@@ -78,17 +101,11 @@ async def get_history(
         await cur.execute(queries.GET_CHAT_HISTORY, (userId, 50))
         messages = await cur.fetchall()
         
-        return JSONResponse([
-            {
-                "sender": msg["sender"],
-                "message": msg["message"],
-                "timestamp": msg["timestamp"].isoformat() if msg.get("timestamp") else None
-            }
-            for msg in messages
-        ])
+        # Rows already have the response shape; orjson writes the datetimes as ISO 8601
+        return ORJSONResponse(messages)
     except Exception as e:
         print(f"Error getting history: {e}")
-        return JSONResponse([], status_code=200)
+        return ORJSONResponse([], status_code=200)
 
 
 @router.get("/state")
@@ -98,22 +115,20 @@ async def get_state(
 ):
     """Get user's current conversation state"""
     try:
-        await cur.execute(
-            "SELECT state, state_data FROM ChatbotState WHERE user_id = %s",
-            (userId,)
-        )
+        await cur.execute(queries.GET_CHATBOT_STATE, (userId,))
         state = await cur.fetchone()
         
         if state:
-            return JSONResponse({
+            # state_data is already JSON text; embed it as-is instead of parsing and re-encoding
+            return ORJSONResponse({
                 "state": state["state"],
-                "data": state["state_data"]
+                "data": orjson.Fragment(state["state_data"] or "{}")
             })
         
-        return JSONResponse({"state": "menu", "data": {}})
+        return ORJSONResponse({"state": "menu", "data": {}})
     except Exception as e:
         print(f"Error getting state: {e}")
-        return JSONResponse({"state": "menu", "data": {}})
+        return ORJSONResponse({"state": "menu", "data": {}})
 
 
 @router.post("/reset")
@@ -122,11 +137,11 @@ async def reset_state(
     cur: Annotated[Cur, Depends(get_db)]
 ):
     """Reset user's conversation state to menu"""
-    data = await req.json()
+    data = orjson.loads(await req.body())
     user_id = data.get("userId")
     
     if not user_id:
-        return JSONResponse({"error": "userId required"}, status_code=400)
+        return ORJSONResponse({"error": "userId required"}, status_code=400)
     
     try:
         await cur.execute(
@@ -139,10 +154,10 @@ async def reset_state(
         )
         await cur._connection.commit()
         
-        return JSONResponse({"message": "State reset to menu"})
+        return ORJSONResponse({"message": "State reset to menu"})
     except Exception as e:
         print(f"Error resetting state: {e}")
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 
 @router.get("/extracted")
@@ -155,15 +170,7 @@ async def get_extracted_info(
         await cur.execute(queries.GET_EXTRACTED_INFO, (userId,))
         extracted = await cur.fetchall()
         
-        return JSONResponse([
-            {
-                "category": item["category"],
-                "value": item["value"],
-                "context": item.get("context", ""),
-                "timestamp": item["timestamp"].isoformat() if item.get("timestamp") else None
-            }
-            for item in extracted
-        ])
+        return ORJSONResponse(extracted)
     except Exception as e:
         print(f"Error getting extracted info: {e}")
-        return JSONResponse([], status_code=200)
\ No newline at end of file
+        return ORJSONResponse([], status_code=200)
\ No newline at end of file
@@ -8,6 +8,11 @@ class Config(BaseSettings):
     mysql_db: str = "expense_tracker"
     mysql_user: str
     mysql_pass: str
+    mysql_pool_size: int = 10
+    mysql_pool_timeout: float = 30.0
+    uvicorn_reload: bool = False
+    # Each worker opens its own pool: workers x mysql_pool_size must fit MySQL's max_connections
+    uvicorn_workers: int = 1
     aviation_api_key: str 
     secret_phrase: str | None = None     
 
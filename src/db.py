@@ -1,3 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from types import MappingProxyType
+
 from fastapi import Request
 import mysql.connector.aio as mysql_connector
 from mysql.connector.aio import PooledMySQLConnection, MySQLConnectionAbstract
@@ -9,21 +14,109 @@ Db = PooledMySQLConnection | MySQLConnectionAbstract
 Cur = MySQLCursorAbstract
 
 
+@lru_cache
+def _connect_kwargs() -> MappingProxyType:
+    """Connection settings, read from the config once for every pooled connection"""
+    config = get_config()
+    return MappingProxyType({
+        "host": config.mysql_host,
+        "port": config.mysql_port,
+        "database": config.mysql_db,
+        "user": config.mysql_user,
+        "password": config.mysql_pass,
+    })
+
+
 async def connect_to_db():
+    conn = await mysql_connector.connect(**_connect_kwargs())
+    return conn
+
+
+class ConnectionPool:
+    """Fixed set of connection slots handed out to one request at a time"""
+
+    def __init__(self, conns: list[Db], acquire_timeout: float):
+        self._conns = set(conns)
+        self._acquire_timeout = acquire_timeout
+        # A None slot lost its connection and is reconnected by the next acquire
+        self._idle: asyncio.Queue[Db | None] = asyncio.Queue()
+        for conn in conns:
+            self._idle.put_nowait(conn)
+
+    async def acquire(self) -> Db:
+        # An exhausted pool fails the request with TimeoutError instead of hanging it
+        conn = await asyncio.wait_for(self._idle.get(), self._acquire_timeout)
+        if conn is not None and conn.is_socket_connected():
+            return conn
+        try:
+            fresh = await connect_to_db()
+        except BaseException:
+            # Database still unreachable: keep the slot so a later acquire can retry
+            self._idle.put_nowait(None)
+            raise
+        if conn is not None:
+            self._conns.discard(conn)
+            await conn.shutdown()
+        self._conns.add(fresh)
+        return fresh
+
+    async def release(self, conn: Db):
+        """Return a connection, discarding any work the request did not commit"""
+        if conn.in_transaction:
+            try:
+                await conn.rollback()
+            except Exception:
+                # Broken connection: free its slot for the next acquire to reconnect
+                self._conns.discard(conn)
+                await conn.shutdown()
+                conn = None
+        self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def connection(self):
+        db = await self.acquire()
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        """Run a read on its own pooled connection, so independent reads can overlap"""
+        async with self.connection() as db:
+            cur = await db.cursor(dictionary=True)
+            try:
+                await cur.execute(sql, params)
+                return await cur.fetchone()
+            finally:
+                await cur.close()
+
+    async def fetchall(self, sql: str, params: tuple = ()):
+        """Run a read on its own pooled connection, so independent reads can overlap"""
+        async with self.connection() as db:
+            cur = await db.cursor(dictionary=True)
+            try:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+            finally:
+                await cur.close()
+
+    async def close(self):
+        for conn in self._conns:
+            await conn.close()
+
+
+async def create_pool():
     config = get_config()
-    conn = await mysql_connector.connect(
-        host=config.mysql_host,
-        port=config.mysql_port,
-        database=config.mysql_db,
-        user=config.mysql_user,
-        password=config.mysql_pass,
-    )
+    conns = await asyncio.gather(*(connect_to_db() for _ in range(config.mysql_pool_size)))
     print("Connected to Database!")
-    return conn
+    return ConnectionPool(list(conns), config.mysql_pool_timeout)
 
 
 async def get_db(req: Request):
-    db: Db = req.app.state.db
-    cur = await db.cursor(dictionary=True)
-    yield cur
-    await cur.close()
+    pool: ConnectionPool = req.app.state.pool
+    async with pool.connection() as db:
+        cur = await db.cursor(dictionary=True)
+        try:
+            yield cur
+        finally:
+            await cur.close()
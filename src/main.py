@@ -1,16 +1,26 @@
+import asyncio
+from collections import defaultdict
+from itertools import accumulate
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, ORJSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from pydantic import BaseModel
 from typing import Annotated, Optional
 from datetime import datetime, timedelta  # FIXED: Added timedelta import
+import hashlib
+import hmac
 import os
+import secrets
+import shutil
 from pathlib import Path
 from .trip_planner import TripPlanner
 import json
-from .db import connect_to_db, get_db, Cur
+from .db import create_pool, get_db, Cur, ConnectionPool
 from .config import get_config
 from . import queries
 from .chatbot.router import router as chatbot_router 
@@ -18,49 +28,120 @@ from .chatbot.router import router as chatbot_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.db = await connect_to_db()
+    app.state.pool = await create_pool()
+    # Compile every template up front so no request pays the first-render parse
+    for name in templates.env.list_templates():
+        templates.env.get_template(name)
     yield
-    if app.state.db:
-        await app.state.db.close()
+    await app.state.pool.close()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# The group and trip JSON repeats the same keys per row and compresses well
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+config = get_config()
 
 BASE_DIR = Path(__file__).resolve().parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+STATIC_DIR = BASE_DIR / "static"
+TEMPLATES_DIR = BASE_DIR / "templates"
+UPLOAD_DIR = Path("uploads")
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# Outside development templates only change on deploy, so skip the per-render mtime check
+templates.env.auto_reload = config.uvicorn_reload
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names never get reused, so clients may cache them indefinitely"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
 
 # Create directories if they don't exist
-os.makedirs("uploads", exist_ok=True)
-os.makedirs(str(BASE_DIR / "static"), exist_ok=True)  
+UPLOAD_DIR.mkdir(exist_ok=True)
+STATIC_DIR.mkdir(exist_ok=True)
 
 # Mount static files and uploads
-app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), "static")  
-app.mount("/uploads", StaticFiles(directory="uploads"), "uploads")
+app.mount("/static", StaticFiles(directory=STATIC_DIR), "static")
+# Receipt names carry a random token, so an upload's URL always refers to the same bytes
+app.mount("/uploads", ImmutableStaticFiles(directory=UPLOAD_DIR), "uploads")
 
 # Include chatbot router
 app.include_router(chatbot_router) 
- 
-config = get_config()
+
 trip_planner = TripPlanner(aviation_api_key=config.aviation_api_key)
 
 
+# Rendered error pages by (base URL, status, detail); the page's only request-dependent part is its url_for links
+_error_pages: dict[tuple[str, int, str], str] = {}
+_ERROR_PAGES_MAX = 256
+
+
 @app.exception_handler(StarletteHTTPException)
 async def handle_http_exception(req: Request, exc: StarletteHTTPException):
-    return templates.TemplateResponse(
-        req,
-        "error.html",
-        {"status": exc.status_code, "detail": exc.detail},
-        status_code=exc.status_code
-    )
+    key = (str(req.base_url), exc.status_code, str(exc.detail))
+    html = _error_pages.get(key)
+    if html is None:
+        html = templates.get_template("error.html").render(
+            request=req, status=exc.status_code, detail=exc.detail
+        )
+        if len(_error_pages) < _ERROR_PAGES_MAX:
+            _error_pages[key] = html
+    return HTMLResponse(html, status_code=exc.status_code)
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     return RedirectResponse(url="/static/images/logo.png")
 
 # AUTHENTICATION ROUTES
-@app.get("/", response_class=HTMLResponse)
+class LoginForm(BaseModel):
+    username: str
+    password: str
+
+
+class SignupForm(LoginForm):
+    first_name: str
+    last_name: str
+    mobile: str
+    currency: str
+
+
+_SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1}
+
+
+def _hash_password(password: str) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, **_SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${digest.hex()}"
+
+
+def _parse_password_hash(stored: str) -> tuple[bytes, bytes] | None:
+    """Split a stored scrypt hash into (salt, digest); None for anything else"""
+    parts = stored.split("$", 2)
+    if len(parts) != 3 or parts[0] != "scrypt":
+        return None
+    try:
+        return bytes.fromhex(parts[1]), bytes.fromhex(parts[2])
+    except ValueError:
+        return None
+
+
+def _verify_password(password: str, stored: str) -> bool:
+    parsed = _parse_password_hash(stored)
+    if parsed is None:
+        # Accounts created before hashing still hold the plain password, which may even start with "scrypt$"
+        return hmac.compare_digest(password.encode(), stored.encode())
+    salt, digest = parsed
+    candidate = hashlib.scrypt(password.encode(), salt=salt, **_SCRYPT_PARAMS)
+    return hmac.compare_digest(candidate, digest)
+
+
+@app.get("/", include_in_schema=False)
 async def root():
-    return RedirectResponse(url="/login")
+    # Permanent and cacheable, so returning browsers go straight to /login
+    return RedirectResponse(url="/login", status_code=301, headers={"Cache-Control": "public, max-age=86400"})
 
 
 @app.get("/signup", response_class=HTMLResponse)
@@ -72,18 +153,18 @@ async def signup_page(req: Request):
 async def signup(
     req: Request,
     cur: Annotated[Cur, Depends(get_db)],
-    username: str = Form(...),
-    first_name: str = Form(...),
-    last_name: str = Form(...),
-    mobile: str = Form(...),
-    currency: str = Form(...),
-    password: str = Form(...)
+    form: Annotated[SignupForm, Form()]
 ):
-    await cur.execute(queries.GET_USER, (username,))
+    await cur.execute(queries.USER_EXISTS, (form.username,))
     if await cur.fetchone():
         return templates.TemplateResponse(req, "signup.html", {"error": "Username already taken"})
 
-    await cur.execute(queries.CREATE_USER, (username, first_name, last_name, mobile, currency, password))
+    # scrypt is deliberately CPU-heavy, so keep it off the event loop
+    password_hash = await run_in_threadpool(_hash_password, form.password)
+    await cur.execute(
+        queries.CREATE_USER,
+        (form.username, form.first_name, form.last_name, form.mobile, form.currency, password_hash)
+    )
     await cur._connection.commit()
     return RedirectResponse(url="/login", status_code=303)
 
@@ -95,15 +176,18 @@ async def login_page(req: Request):
 async def login(
     req: Request,
     cur: Annotated[Cur, Depends(get_db)],
-    username: str = Form(...),
-    password: str = Form(...)
+    form: Annotated[LoginForm, Form()]
 ):
-    await cur.execute(queries.GET_USER, (username,))
+    await cur.execute(queries.GET_USER_AUTH, (form.username,))
     user = await cur.fetchone()
     
-    if not user or user["password"] != password:
+    if not user or not await run_in_threadpool(_verify_password, form.password, user["password"]):
         return templates.TemplateResponse(req, "login.html", {"error": "Invalid credentials"})
     
+    if _parse_password_hash(user["password"]) is None:
+        await cur.execute(queries.UPDATE_USER_PASSWORD, (await run_in_threadpool(_hash_password, form.password), form.username))
+        await cur._connection.commit()
+    
     return RedirectResponse(url=f"/dashboard?userId={user['username']}", status_code=303)
 
 
@@ -121,19 +205,19 @@ async def dashboard(req: Request, userId: str, cur: Annotated[Cur, Depends(get_d
 
 # PROFILE
 @app.get("/profile", response_class=HTMLResponse)
-async def profile(req: Request, userId: str, cur: Annotated[Cur, Depends(get_db)]):
-    await cur.execute(queries.GET_USER, (userId,))
-    user = await cur.fetchone()
+async def profile(req: Request, userId: str):
+    # Three independent reads, each on its own pooled connection, run concurrently.
+    # No request-scoped connection is held meanwhile, so a busy pool cannot deadlock.
+    pool: ConnectionPool = req.app.state.pool
+    user, groups, transactions = await asyncio.gather(
+        pool.fetchone(queries.GET_USER, (userId,)),
+        pool.fetchall(queries.GET_GROUPS_FOR_USER, (userId,)),
+        pool.fetchall(queries.GET_PAID_TRANSACTIONS_FOR_USER, (userId, userId)),
+    )
     
     if not user:
         raise StarletteHTTPException(status_code=404, detail="User not found")
     
-    await cur.execute(queries.GET_GROUPS_FOR_USER, (userId,))
-    groups = await cur.fetchall()
-    
-    await cur.execute(queries.GET_PAID_TRANSACTIONS_FOR_USER, (userId, userId))
-    transactions = await cur.fetchall()
-    
     return templates.TemplateResponse(
         req, "profile.html", 
         {"user": user, "userId": userId, "groups": groups, "transactions": transactions}
@@ -143,123 +227,117 @@ async def profile(req: Request, userId: str, cur: Annotated[Cur, Depends(get_db)
 # API ENDPOINTS FOR AJAX
 @app.get("/api/profile")
 async def api_profile(userId: str, cur: Annotated[Cur, Depends(get_db)]):
-    await cur.execute(queries.GET_USER, (userId,))
+    await cur.execute(queries.GET_USER_PROFILE, (userId,))
     user = await cur.fetchone()
     
     if not user:
-        return JSONResponse({"error": "User not found"}, status_code=404)
-    
-    user_dict = dict(user)
+        return ORJSONResponse({"error": "User not found"}, status_code=404)
     
-    if user_dict.get("debt") is not None:
-        user_dict["debt"] = float(user_dict["debt"])
-        
-    return JSONResponse(user_dict)
+    return ORJSONResponse(user)
 
 
 @app.get("/api/transactions")
 async def api_transactions(userId: str, cur: Annotated[Cur, Depends(get_db)]):
     await cur.execute(queries.GET_PAID_TRANSACTIONS_FOR_USER, (userId, userId))
     transactions = await cur.fetchall()
-    return JSONResponse([
-        {
-            **dict(t),
-            'payment_timestamp': t['payment_timestamp'].isoformat() if t.get('payment_timestamp') else None
-        }
-        for t in transactions
-    ])
+    # orjson writes the datetimes itself; only DECIMAL amounts need converting
+    for t in transactions:
+        t["amount"] = float(t["amount"])
+    return ORJSONResponse(transactions)
 
 
 # GROUPS
+async def _existing_usernames(cur: Cur, usernames: set[str]) -> set[str]:
+    """Return which of the given usernames exist, using a single IN query"""
+    if not usernames:
+        return set()
+    params = tuple(usernames)
+    placeholders = ", ".join(["%s"] * len(params))
+    await cur.execute(queries.GET_EXISTING_USERNAMES.format(placeholders=placeholders), params)
+    return {row["username"] for row in await cur.fetchall()}
+
+
+async def _fetch_group_details(pool: ConnectionPool, group_names: list[str]):
+    """Load members and events (with their transactions) for many groups in three concurrent queries"""
+    members_by_group = defaultdict(list)
+    events_by_group = defaultdict(list)
+    if not group_names:
+        return members_by_group, events_by_group
+    
+    params = tuple(group_names)
+    placeholders = ", ".join(["%s"] * len(params))
+    
+    # The three reads are independent, so each runs on its own pooled connection
+    members, events, transactions = await asyncio.gather(
+        pool.fetchall(queries.GET_MEMBERS_FOR_GROUPS.format(placeholders=placeholders), params),
+        pool.fetchall(queries.GET_EVENTS_FOR_GROUPS.format(placeholders=placeholders), params),
+        pool.fetchall(queries.GET_TRANSACTIONS_FOR_GROUPS.format(placeholders=placeholders), params),
+    )
+    
+    for member in members:
+        members_by_group[member.pop("group_name")].append(member)
+    
+    events_by_key = {}
+    for event in events:
+        event["transactions"] = []
+        events_by_key[(event["group_name"], event["event_name"])] = event
+        events_by_group[event["group_name"]].append(event)
+    
+    for t in transactions:
+        events_by_key[(t["group_name"], t["event_name"])]["transactions"].append(t)
+    
+    return members_by_group, events_by_group
+
+
 @app.get("/groups", response_class=HTMLResponse)
-async def groups(req: Request, userId: str, cur: Annotated[Cur, Depends(get_db)]):
-    await cur.execute(queries.GET_GROUPS_FOR_USER, (userId,))
-    groups_data = await cur.fetchall()
+async def groups(req: Request, userId: str):
+    pool: ConnectionPool = req.app.state.pool
+    groups_data = await pool.fetchall(queries.GET_GROUPS_FOR_USER, (userId,))
     
-    groups_with_details = []
+    members_by_group, events_by_group = await _fetch_group_details(
+        pool, [group["group_name"] for group in groups_data]
+    )
+    
+    # The rows are fresh dicts from the cursor, so coerce them in place rather than copying.
+    # Dates become strings and DECIMALs floats, because the template embeds them with tojson.
     for group in groups_data:
-        await cur.execute(queries.GET_GROUP_MEMBERS, (group["group_name"],))
-        members = await cur.fetchall()
-        
-        await cur.execute(queries.GET_EVENTS_FOR_GROUP, (group["group_name"],))
-        events = await cur.fetchall()
+        if group.get("created_at"):
+            group["created_at"] = group["created_at"].isoformat()
         
-        events_with_transactions = []
-        for event in events:
-            await cur.execute(queries.GET_TRANSACTIONS_FOR_EVENT, 
-                              (group["group_name"], event["event_name"]))
-            transactions = await cur.fetchall()
-            event_dict = dict(event)
-            # Convert datetime objects to strings for JSON serialization
+        for event_dict in events_by_group[group["group_name"]]:
             if event_dict.get("created_at"):
                 event_dict["created_at"] = event_dict["created_at"].isoformat()
-            event_dict["transactions"] = [
-                {
-                    **dict(t),
-                    'amount': float(t['amount']) if t.get('amount') is not None else 0.0,
-                    'timestamp': t['timestamp'].isoformat() if t.get('timestamp') else None
-                }
-                for t in transactions
-            ]
-            events_with_transactions.append(event_dict)
+            for t in event_dict["transactions"]:
+                t["amount"] = float(t["amount"]) if t.get("amount") is not None else 0.0
+                t["timestamp"] = t["timestamp"].isoformat() if t.get("timestamp") else None
         
-        group_dict = dict(group)
-        # Convert datetime for group as well
-        if group_dict.get("created_at"):
-            group_dict["created_at"] = group_dict["created_at"].isoformat()
-        
-        # Convert members and handle Decimal types
-        group_dict["members"] = [
-            {
-                **dict(m),
-                "debt": float(m["debt"]) if m.get("debt") is not None else 0.0
-            }
-            for m in members
-        ]
-        group_dict["events"] = events_with_transactions
-        groups_with_details.append(group_dict)
+        group["members"] = members_by_group[group["group_name"]]
+        group["events"] = events_by_group[group["group_name"]]
     
     return templates.TemplateResponse(
         req, "groups.html", 
-        {"groups": groups_with_details, "userId": userId}
+        {"groups": groups_data, "userId": userId}
     )
 
 
 @app.get("/api/groupsForUser")
-async def api_groups_for_user(userId: str, cur: Annotated[Cur, Depends(get_db)]):
-    await cur.execute(queries.GET_GROUPS_FOR_USER, (userId,))
-    groups = await cur.fetchall()
+async def api_groups_for_user(req: Request, userId: str):
+    pool: ConnectionPool = req.app.state.pool
+    groups = await pool.fetchall(queries.GET_GROUPS_FOR_USER, (userId,))
+    
+    members_by_group, events_by_group = await _fetch_group_details(
+        pool, [group["group_name"] for group in groups]
+    )
     
-    groups_with_details = []
     for group in groups:
-        await cur.execute(queries.GET_GROUP_MEMBERS, (group["group_id"],))
-        members = await cur.fetchall()
-        
-        await cur.execute(queries.GET_EVENTS_FOR_GROUP, (group["group_id"],))
-        events = await cur.fetchall()
-        
-        events_with_transactions = []
+        events = events_by_group[group["group_name"]]
         for event in events:
-            await cur.execute(queries.GET_TRANSACTIONS_FOR_EVENT, (group["group_id"], event["event_name"]))
-            transactions = await cur.fetchall()
-            event_dict = dict(event)
-            event_dict["created_at"] = event_dict["created_at"].isoformat() if event_dict.get("created_at") else None
-            event_dict["transactions"] = [
-                {
-                    **dict(t),
-                    'timestamp': t['timestamp'].isoformat() if t.get('timestamp') else None
-                }
-                for t in transactions
-            ]
-            events_with_transactions.append(event_dict)
-        
-        group_dict = dict(group)
-        group_dict["created_at"] = group_dict["created_at"].isoformat() if group_dict.get("created_at") else None
-        group_dict["members"] = [m["user_id"] for m in members]
-        group_dict["events"] = events_with_transactions
-        groups_with_details.append(group_dict)
+            for t in event["transactions"]:
+                t["amount"] = float(t["amount"])
+        group["members"] = [m["username"] for m in members_by_group[group["group_name"]]]
+        group["events"] = events
     
-    return JSONResponse(groups_with_details)
+    return ORJSONResponse(groups)
 
 
 @app.get("/make-group", response_class=HTMLResponse)
@@ -275,7 +353,7 @@ async def create_group(req: Request, cur: Annotated[Cur, Depends(get_db)]):
     group_name = data["groupName"]
     members_input = data.get("members", [])
     
-    await cur.execute("SELECT * FROM `Group` WHERE group_name = %s", (group_name,))
+    await cur.execute(queries.GROUP_EXISTS, (group_name,))
     if await cur.fetchone():
         return JSONResponse(
             {"error": f"The group name '{group_name}' is already taken. Please choose another name."}, 
@@ -284,14 +362,12 @@ async def create_group(req: Request, cur: Annotated[Cur, Depends(get_db)]):
 
     clean_members = list(set([m.strip() for m in members_input if m.strip()]))
     
-    await cur.execute(queries.GET_USER, (creator_id,))
-    if not await cur.fetchone():
+    existing = await _existing_usernames(cur, {creator_id, *clean_members})
+    if creator_id not in existing:
         return JSONResponse({"error": "Creator account not found."}, status_code=400)
 
     for username in clean_members:
-        if username == creator_id: continue
-        await cur.execute(queries.GET_USER, (username,))
-        if not await cur.fetchone():
+        if username not in existing:
              return JSONResponse({"error": f"User '{username}' does not exist."}, status_code=400)
 
     try:
@@ -303,25 +379,29 @@ async def create_group(req: Request, cur: Annotated[Cur, Depends(get_db)]):
         if creator_id not in clean_members:
             clean_members.append(creator_id)
 
-        for member_id in clean_members:
-            await cur.execute(queries.ADD_GROUP_MEMBER, (group_name, member_id))
+        await cur.executemany(queries.ADD_GROUP_MEMBER, [(group_name, member_id) for member_id in clean_members])
         
         if data.get("events"):
-            for event in data["events"]:
-                await cur.execute(
-                    queries.CREATE_EVENT,
+            await cur.executemany(
+                queries.CREATE_EVENT,
+                [
                     (group_name, event["eventName"], creator_id, event.get("description", ""), event.get("duration", ""))
+                    for event in data["events"]
+                ]
+            )
+            
+            # Events go in first so every transaction's (group, event) key exists
+            txn_rows = [
+                (
+                    group_name, event["eventName"], creator_id, 
+                    txn["owedBy"], txn["owedTo"], txn["amount"], 
+                    txn.get("reason", "")
                 )
-                
-                for txn in event.get("transactions", []):
-                    await cur.execute(
-                        queries.CREATE_TRANSACTION,
-                        (
-                            group_name, event["eventName"], creator_id, 
-                            txn["owedBy"], txn["owedTo"], txn["amount"], 
-                            txn.get("reason", ""), datetime.now()
-                        )
-                    )
+                for event in data["events"]
+                for txn in event.get("transactions", [])
+            ]
+            if txn_rows:
+                await cur.executemany(queries.CREATE_TRANSACTION, txn_rows)
         
         await cur._connection.commit()
         return JSONResponse({"message": "Group created"})
@@ -339,45 +419,41 @@ async def add_event(req: Request, cur: Annotated[Cur, Depends(get_db)]):
     group_name = data["groupName"]
     current_user = data.get("createdBy", "unknown") 
 
-    await cur.execute(
-        "SELECT * FROM Event WHERE group_name = %s AND event_name = %s", 
-        (group_name, event["eventName"])
-    )
+    await cur.execute(queries.EVENT_EXISTS, (group_name, event["eventName"]))
     if await cur.fetchone():
         return JSONResponse({"error": "Event name must be unique in this group"}, status_code=400)
 
+    transactions = event.get("transactions", [])
+    for txn in transactions:
+        if not txn.get("owedBy") or not txn.get("owedTo"):
+            return JSONResponse({"error": "Every transaction needs owedBy and owedTo."}, status_code=400)
+        if txn["owedBy"] == txn["owedTo"]:
+            return JSONResponse({"error": "Users cannot owe money to themselves."}, status_code=400)
+
+    # Validate every user named in the transactions with one query, before any writes
+    existing = await _existing_usernames(cur, {name for txn in transactions for name in (txn["owedBy"], txn["owedTo"])})
+    for txn in transactions:
+        for username in (txn["owedBy"], txn["owedTo"]):
+            if username not in existing:
+                return JSONResponse({"error": f"User '{username}' does not exist."}, status_code=400)
+
     try:
         await cur.execute(
             queries.CREATE_EVENT,
             (group_name, event["eventName"], current_user, event.get("description", ""), event.get("duration", ""))
         )
         
-        for txn in event.get("transactions", []):
-            owed_by = txn["owedBy"]
-            owed_to = txn["owedTo"]
-
-            if owed_by == owed_to:
-                await cur._connection.rollback()
-                return JSONResponse({"error": "Users cannot owe money to themselves."}, status_code=400)
-
-            await cur.execute("SELECT username FROM User WHERE username = %s", (owed_by,))
-            if not await cur.fetchone():
-                await cur._connection.rollback()
-                return JSONResponse({"error": f"User '{owed_by}' does not exist."}, status_code=400)
-
-            await cur.execute("SELECT username FROM User WHERE username = %s", (owed_to,))
-            if not await cur.fetchone():
-                await cur._connection.rollback()
-                return JSONResponse({"error": f"User '{owed_to}' does not exist."}, status_code=400)
-
-            await cur.execute(
-                queries.CREATE_TRANSACTION,
-                (
-                    group_name, event["eventName"], current_user, 
-                    owed_by, owed_to, txn["amount"], 
-                    txn.get("reason", ""), datetime.now()
-                )
+        txn_rows = [
+            (
+                group_name, event["eventName"], current_user, 
+                txn["owedBy"], txn["owedTo"], txn["amount"], 
+                txn.get("reason", "")
             )
+            for txn in transactions
+        ]
+        
+        if txn_rows:
+            await cur.executemany(queries.CREATE_TRANSACTION, txn_rows)
         
         await cur._connection.commit()
         return JSONResponse({"success": True})
@@ -389,6 +465,11 @@ async def add_event(req: Request, cur: Annotated[Cur, Depends(get_db)]):
 
 
 # TRANSACTIONS
+def _save_upload(src, filepath: Path):
+    with open(filepath, "wb") as f:
+        shutil.copyfileobj(src, f, 1 << 20)
+
+
 @app.post("/api/uploadReceiptOnly")
 async def upload_receipt(
     groupName: str = Form(...),
@@ -399,10 +480,10 @@ async def upload_receipt(
     receipt: UploadFile = File(...),
     cur: Annotated[Cur, Depends(get_db)] = None
 ):
-    filename = f"receipt_{datetime.now().timestamp()}_{receipt.filename}"
-    filepath = os.path.join("uploads", filename)
-    with open(filepath, "wb") as f:
-        f.write(await receipt.read())
+    # Keep only the base name so a crafted filename cannot escape the uploads directory
+    filename = f"receipt_{secrets.token_hex(8)}_{Path(receipt.filename or 'receipt').name}"
+    # Copy in chunks on a worker thread: bounded memory and no blocking disk I/O on the event loop
+    await run_in_threadpool(_save_upload, receipt.file, UPLOAD_DIR / filename)
 
     await cur.execute(queries.GET_TRANSACTION_BY_DETAILS, (groupName, eventName, timestamp, owedBy, owedTo))
     transaction = await cur.fetchone()
@@ -531,31 +612,31 @@ async def save_trip(req: Request, cur: Annotated[Cur, Depends(get_db)]):
         # Get the optimal path from route_data
         optimal_path_indices = route_data.get("paths", [{}])[0].get("path_indices", list(range(len(destinations))))
         
-        # Add destinations in optimal order
-        destination_ids = []
+        # Days spent before reaching each stop, as a running total along the path
+        days_before = list(accumulate((destinations[i]["days"] for i in optimal_path_indices), initial=0))
+        
+        # Add destinations in optimal order, as one multi-row insert
+        destination_rows = []
         for visit_order, city_idx in enumerate(optimal_path_indices):
             dest = destinations[city_idx]
             
             # Calculate dates
-            cumulative_days = sum(destinations[optimal_path_indices[i]]["days"] for i in range(visit_order))
-            arrival_date = start_date + timedelta(days=cumulative_days)
+            arrival_date = start_date + timedelta(days=days_before[visit_order])
             departure_date = arrival_date + timedelta(days=dest["days"])
             
-            await cur.execute(
-                queries.ADD_DESTINATION,
-                (
-                    trip_id,
-                    dest["city"],
-                    dest["country"],
-                    dest.get("airport"),
-                    dest.get("latitude"),
-                    dest.get("longitude"),
-                    visit_order + 1,
-                    arrival_date,
-                    departure_date
-                )
-            )
-            destination_ids.append(cur.lastrowid)
+            destination_rows.append((
+                trip_id,
+                dest["city"],
+                dest["country"],
+                dest.get("airport"),
+                dest.get("latitude"),
+                dest.get("longitude"),
+                visit_order + 1,
+                arrival_date,
+                departure_date
+            ))
+        
+        await cur.executemany(queries.ADD_DESTINATION, destination_rows)
         
         # Save pathway calculation
         await cur.execute(
@@ -585,88 +666,89 @@ async def save_trip(req: Request, cur: Annotated[Cur, Depends(get_db)]):
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+async def _fetch_trip_details(pool: ConnectionPool, trip_ids: list[int]):
+    """Load destinations, routes and the optimal pathway for many trips in three concurrent queries"""
+    destinations_by_trip = defaultdict(list)
+    routes_by_trip = defaultdict(list)
+    pathway_by_trip = {}
+    if not trip_ids:
+        return destinations_by_trip, routes_by_trip, pathway_by_trip
+    
+    params = tuple(trip_ids)
+    placeholders = ", ".join(["%s"] * len(params))
+    
+    destinations, routes, pathways = await asyncio.gather(
+        pool.fetchall(queries.GET_DESTINATIONS_FOR_TRIPS.format(placeholders=placeholders), params),
+        pool.fetchall(queries.GET_ROUTES_FOR_TRIPS.format(placeholders=placeholders), params),
+        pool.fetchall(queries.GET_OPTIMAL_PATHWAYS_FOR_TRIPS.format(placeholders=placeholders), params),
+    )
+    
+    for d in destinations:
+        destinations_by_trip[d["trip_id"]].append(d)
+    for r in routes:
+        routes_by_trip[r["trip_id"]].append(r)
+    for pathway in pathways:
+        pathway_by_trip.setdefault(pathway["trip_id"], pathway)
+    
+    return destinations_by_trip, routes_by_trip, pathway_by_trip
+
+
 @app.get("/api/trips")
-async def get_trips(userId: str, groupName: Optional[str] = None, 
-                   cur: Annotated[Cur, Depends(get_db)] = None):
+async def get_trips(req: Request, userId: str, groupName: Optional[str] = None):
     """Get trips for a user or group"""
+    pool: ConnectionPool = req.app.state.pool
     try:
         if groupName:
-            await cur.execute(queries.GET_TRIPS_FOR_GROUP, (groupName,))
+            trips = await pool.fetchall(queries.GET_TRIPS_FOR_GROUP, (groupName,))
         else:
-            await cur.execute(queries.GET_TRIPS_FOR_USER, (userId, userId))
+            trips = await pool.fetchall(queries.GET_TRIPS_FOR_USER, (userId, userId))
         
-        trips = await cur.fetchall()
+        destinations_by_trip, routes_by_trip, pathway_by_trip = await _fetch_trip_details(
+            pool, [trip["trip_id"] for trip in trips]
+        )
         
-        result = []
         for trip in trips:
-            trip_dict = dict(trip)
-            trip_dict["created_at"] = trip_dict["created_at"].isoformat()
-            
-            # Get destinations
-            await cur.execute(queries.GET_DESTINATIONS_FOR_TRIP, (trip["trip_id"],))
-            destinations = await cur.fetchall()
-            trip_dict["destinations"] = [
-                {
-                    **dict(d),
-                    "latitude": float(d["latitude"]) if d.get("latitude") else None,
-                    "longitude": float(d["longitude"]) if d.get("longitude") else None,
-                    "arrival_date": d["arrival_date"].isoformat() if d.get("arrival_date") else None,
-                    "departure_date": d["departure_date"].isoformat() if d.get("departure_date") else None
-                }
-                for d in destinations
-            ]
+            destinations = destinations_by_trip[trip["trip_id"]]
+            for d in destinations:
+                d["latitude"] = float(d["latitude"]) if d.get("latitude") else None
+                d["longitude"] = float(d["longitude"]) if d.get("longitude") else None
+            trip["destinations"] = destinations
             
-            # Get routes
-            await cur.execute(queries.GET_ROUTES_FOR_TRIP, (trip["trip_id"],))
-            routes = await cur.fetchall()
-            trip_dict["routes"] = [
-                {
-                    **dict(r),
-                    "flight_cost": float(r["flight_cost"]) if r.get("flight_cost") else None,
-                    "departure_time": r["departure_time"].isoformat() if r.get("departure_time") else None,
-                    "arrival_time": r["arrival_time"].isoformat() if r.get("arrival_time") else None
-                }
-                for r in routes
-            ]
+            routes = routes_by_trip[trip["trip_id"]]
+            for r in routes:
+                r["flight_cost"] = float(r["flight_cost"]) if r.get("flight_cost") else None
+            trip["routes"] = routes
             
-            # Get optimal pathway
-            await cur.execute(queries.GET_OPTIMAL_PATHWAY, (trip["trip_id"],))
-            pathway = await cur.fetchone()
+            pathway = pathway_by_trip.get(trip["trip_id"])
             if pathway:
-                trip_dict["optimal_pathway"] = {
-                    **dict(pathway),
-                    "total_cost": float(pathway["total_cost"]) if pathway.get("total_cost") else None
-                }
-            
-            result.append(trip_dict)
+                pathway["total_cost"] = float(pathway["total_cost"]) if pathway.get("total_cost") else None
+                trip["optimal_pathway"] = pathway
         
-        return JSONResponse(result)
+        # orjson writes the dates and datetimes itself; DECIMAL columns are converted above
+        return ORJSONResponse(trips)
         
     except Exception as e:
         print(f"Error fetching trips: {e}")
         import traceback
         traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 
 @app.get("/trip/{trip_id}", response_class=HTMLResponse)
-async def view_trip(req: Request, trip_id: int, userId: str, cur: Annotated[Cur, Depends(get_db)]):
+async def view_trip(req: Request, trip_id: int, userId: str):
     """View trip details and destinations"""
-    await cur.execute(queries.GET_TRIP_BY_ID, (trip_id,))
-    trip = await cur.fetchone()
+    # Four independent reads, each on its own pooled connection, run concurrently
+    pool: ConnectionPool = req.app.state.pool
+    trip, destinations, routes, pathway = await asyncio.gather(
+        pool.fetchone(queries.GET_TRIP_BY_ID, (trip_id,)),
+        pool.fetchall(queries.GET_DESTINATIONS_FOR_TRIP, (trip_id,)),
+        pool.fetchall(queries.GET_ROUTES_FOR_TRIP, (trip_id,)),
+        pool.fetchone(queries.GET_OPTIMAL_PATHWAY, (trip_id,)),
+    )
     
     if not trip:
         raise StarletteHTTPException(status_code=404, detail="Trip not found")
     
-    await cur.execute(queries.GET_DESTINATIONS_FOR_TRIP, (trip_id,))
-    destinations = await cur.fetchall()
-    
-    await cur.execute(queries.GET_ROUTES_FOR_TRIP, (trip_id,))
-    routes = await cur.fetchall()
-    
-    await cur.execute(queries.GET_OPTIMAL_PATHWAY, (trip_id,))
-    pathway = await cur.fetchone()
-    
     return templates.TemplateResponse(
         req, "view_trip.html",
         {
@@ -681,4 +763,11 @@ async def view_trip(req: Request, trip_id: int, userId: str, cur: Annotated[Cur,
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=3000, reload=True)
\ No newline at end of file
+    # The reloader forces a single worker and a file watcher, so only use it when asked for.
+    # "auto" picks uvloop and httptools when installed and falls back to asyncio/h11 elsewhere.
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=3000,
+        reload=config.uvicorn_reload,
+        workers=None if config.uvicorn_reload else config.uvicorn_workers,
+        loop="auto", http="auto"
+    )
\ No newline at end of file
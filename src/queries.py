@@ -1,11 +1,24 @@
 # User queries
 GET_USER = "SELECT * FROM User WHERE username = %s"
 
+GET_EXISTING_USERNAMES = """
+    SELECT username FROM User WHERE username IN ({placeholders})
+"""
+
+GET_USER_PROFILE = """
+    SELECT username, first_name, last_name, mobile, currency, CAST(debt AS DOUBLE) AS debt
+    FROM User WHERE username = %s
+"""
+
 CREATE_USER = """
     INSERT INTO User (username, first_name, last_name, mobile, currency, password)
     VALUES (%s, %s, %s, %s, %s, %s)
 """
 
+GET_USER_AUTH = "SELECT username, password FROM User WHERE username = %s"
+
+UPDATE_USER_PASSWORD = "UPDATE User SET password = %s WHERE username = %s"
+
 # Group queries
 GET_GROUPS_FOR_USER = """
     SELECT g.*, u.first_name as creator_first_name, u.last_name as creator_last_name
@@ -17,10 +30,11 @@ GET_GROUPS_FOR_USER = """
     ORDER BY g.created_at DESC
 """
 
-GET_GROUP_MEMBERS = """
-    SELECT u.* FROM User u
+# Bulk variants take a "{placeholders}" list of %s, one per group name
+GET_MEMBERS_FOR_GROUPS = """
+    SELECT gm.group_name, u.username, u.first_name, u.last_name FROM User u
     JOIN GroupMember gm ON u.username = gm.username
-    WHERE gm.group_name = %s
+    WHERE gm.group_name IN ({placeholders})
 """
 
 CREATE_GROUP = """
@@ -28,17 +42,31 @@ CREATE_GROUP = """
     VALUES (%s, %s, %s)
 """
 
+GET_OWNED_GROUP_MEMBERS = """
+    SELECT gm.username
+    FROM `Group` g
+    LEFT JOIN GroupMember gm ON gm.group_name = g.group_name
+    WHERE g.group_name = %s AND g.created_by = %s
+"""
+
 ADD_GROUP_MEMBER = """
     INSERT INTO GroupMember (group_name, username) VALUES (%s, %s)
 """
 
-DELETE_GROUP_MEMBERS = """
-    DELETE FROM GroupMember WHERE group_name = %s
+REMOVE_GROUP_MEMBERS = """
+    DELETE FROM GroupMember WHERE group_name = %s AND username IN ({placeholders})
 """
 
 # Event queries
-GET_EVENTS_FOR_GROUP = """
-    SELECT * FROM Event WHERE group_name = %s ORDER BY created_at DESC
+GET_GROUP_EVENT_NAMES = """
+    SELECT g.group_name, e.event_name
+    FROM `Group` g
+    LEFT JOIN Event e ON e.group_name = g.group_name
+    WHERE g.group_name = %s
+"""
+
+GET_EVENTS_FOR_GROUPS = """
+    SELECT * FROM Event WHERE group_name IN ({placeholders}) ORDER BY created_at DESC
 """
 
 CREATE_EVENT = """
@@ -47,14 +75,14 @@ CREATE_EVENT = """
 """
 
 # Transaction queries
-GET_TRANSACTIONS_FOR_EVENT = """
+GET_TRANSACTIONS_FOR_GROUPS = """
     SELECT t.*, 
            u1.first_name as owed_by_first, u1.last_name as owed_by_last,
            u2.first_name as owed_to_first, u2.last_name as owed_to_last
     FROM Transaction t
     JOIN User u1 ON t.owed_by = u1.username
     JOIN User u2 ON t.owed_to = u2.username
-    WHERE t.group_name = %s AND t.event_name = %s
+    WHERE t.group_name IN ({placeholders})
     ORDER BY t.timestamp DESC
 """
 
@@ -65,8 +93,13 @@ GET_TRANSACTION_BY_DETAILS = """
 """
 
 CREATE_TRANSACTION = """
-    INSERT INTO Transaction (group_name, event_name, created_by, owed_by, owed_to, amount, reason, timestamp)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    INSERT INTO Transaction (group_name, event_name, created_by, owed_by, owed_to, amount, reason)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+GET_UNPAID_TRANSACTION_FOR_USER = """
+    SELECT amount, owed_by, owed_to, reason, timestamp FROM Transaction
+    WHERE transaction_id = %s AND is_paid = 0 AND %s IN (owed_by, owed_to)
 """
 
 MARK_TRANSACTION_PAID = "UPDATE Transaction SET is_paid = TRUE WHERE transaction_id = %s"
@@ -74,7 +107,8 @@ MARK_TRANSACTION_PAID = "UPDATE Transaction SET is_paid = TRUE WHERE transaction
 UPDATE_TRANSACTION_RECEIPT = "UPDATE Transaction SET receipt_path = %s WHERE transaction_id = %s"
 
 GET_PAID_TRANSACTIONS_FOR_USER = """
-    SELECT * FROM PaidTransaction 
+    SELECT amount, currency, owed_by, owed_to, reason, payment_timestamp
+    FROM PaidTransaction 
     WHERE owed_by = %s OR owed_to = %s
     ORDER BY payment_timestamp DESC
 """
@@ -111,6 +145,11 @@ GET_DESTINATIONS_FOR_TRIP = """
     SELECT * FROM TripDestination WHERE trip_id = %s ORDER BY visit_order
 """
 
+# Bulk variants take a "{placeholders}" list of %s, one per trip id
+GET_DESTINATIONS_FOR_TRIPS = """
+    SELECT * FROM TripDestination WHERE trip_id IN ({placeholders}) ORDER BY trip_id, visit_order
+"""
+
 # Route queries
 ADD_ROUTE = """
     INSERT INTO TripRoute (trip_id, from_destination_id, to_destination_id, flight_cost, airline, flight_number, departure_time, arrival_time)
@@ -128,6 +167,17 @@ GET_ROUTES_FOR_TRIP = """
     ORDER BY r.departure_time
 """
 
+GET_ROUTES_FOR_TRIPS = """
+    SELECT r.*, 
+           d1.city as from_city, d1.airport_code as from_airport,
+           d2.city as to_city, d2.airport_code as to_airport
+    FROM TripRoute r
+    JOIN TripDestination d1 ON r.from_destination_id = d1.destination_id
+    JOIN TripDestination d2 ON r.to_destination_id = d2.destination_id
+    WHERE r.trip_id IN ({placeholders})
+    ORDER BY r.departure_time
+"""
+
 # Pathway queries
 SAVE_PATHWAY = """
     INSERT INTO TripPathways (trip_id, path_sequence, total_cost, total_ways, is_optimal)
@@ -142,6 +192,10 @@ GET_OPTIMAL_PATHWAY = """
     SELECT * FROM TripPathways WHERE trip_id = %s AND is_optimal = TRUE LIMIT 1
 """
 
+GET_OPTIMAL_PATHWAYS_FOR_TRIPS = """
+    SELECT * FROM TripPathways WHERE trip_id IN ({placeholders}) AND is_optimal = TRUE ORDER BY pathway_id
+"""
+
 # Chatbot queries (FIXED - using user_id consistently)
 SAVE_CHAT_MESSAGE = """
     INSERT INTO ChatMessage (user_id, sender, message)
@@ -172,4 +226,26 @@ MARK_EXTRACTED_INFO_USED = """
     UPDATE ExtractedInfo
     SET used = 1
     WHERE user_id = %s AND category = %s
-"""
\ No newline at end of file
+"""
+GET_CHATBOT_STATE = """
+    SELECT state, state_data FROM ChatbotState WHERE user_id = %s
+"""
+
+SET_CHATBOT_STATE = """
+    INSERT INTO ChatbotState (user_id, state, state_data)
+    VALUES (%s, %s, %s) AS new
+    ON DUPLICATE KEY UPDATE state = new.state, state_data = new.state_data
+"""
+
+CLEAR_CHATBOT_STATE = """
+    UPDATE ChatbotState SET state = 'menu', state_data = NULL WHERE user_id = %s
+"""
+
+# Existence checks shared by the chatbot flows
+GROUP_EXISTS = "SELECT 1 FROM `Group` WHERE group_name = %s LIMIT 1"
+
+GROUP_OWNED_BY_EXISTS = "SELECT 1 FROM `Group` WHERE group_name = %s AND created_by = %s LIMIT 1"
+
+EVENT_EXISTS = "SELECT 1 FROM Event WHERE group_name = %s AND event_name = %s LIMIT 1"
+
+USER_EXISTS = "SELECT 1 FROM User WHERE username = %s LIMIT 1"
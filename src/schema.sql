@@ -52,6 +52,7 @@ create table if not exists Transaction (
     timestamp timestamp not null default current_timestamp,
     is_paid boolean not null default false,
     receipt_path varchar(500),
+    INDEX idx_transaction_lookup (group_name, event_name, timestamp, owed_by, owed_to),
     foreign key (group_name, event_name) references Event(group_name, event_name) on update cascade on delete cascade,
     foreign key (owed_by) references User(username) on update cascade on delete cascade,
     foreign key (owed_to) references User(username) on update cascade on delete cascade
@@ -185,7 +186,8 @@ CREATE TABLE IF NOT EXISTS ExtractedInfo (
     used BOOLEAN DEFAULT 0,
     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES User(username) ON DELETE CASCADE,
-    INDEX idx_user_category (user_id, category)
+    INDEX idx_user_category (user_id, category),
+    INDEX idx_user_used_timestamp (user_id, used, timestamp)
 );
 
 commit;
\ No newline at end of file
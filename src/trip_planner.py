@@ -10,6 +10,59 @@ from datetime import datetime, timedelta
 from itertools import permutations
 import time
 
+# City name -> IATA airport code
+_AIRPORT_CODES = {
+    # Indian cities
+    "bengaluru": "BLR", "bangalore": "BLR",
+    "mumbai": "BOM", "bombay": "BOM",
+    "delhi": "DEL", "new delhi": "DEL",
+    "chennai": "MAA", "madras": "MAA",
+    "kolkata": "CCU", "calcutta": "CCU",
+    "hyderabad": "HYD",
+    "pune": "PNQ",
+    "ahmedabad": "AMD",
+    "goa": "GOI",
+    "kochi": "COK", "cochin": "COK",
+    
+    # International
+    "london": "LHR",
+    "paris": "CDG",
+    "new york": "JFK",
+    "dubai": "DXB",
+    "singapore": "SIN",
+    "tokyo": "NRT",
+    "bangkok": "BKK",
+    "hong kong": "HKG",
+    "sydney": "SYD",
+    "los angeles": "LAX",
+    "san francisco": "SFO",
+    "chicago": "ORD",
+    "miami": "MIA",
+    "toronto": "YYZ",
+    "vancouver": "YVR",
+    "frankfurt": "FRA",
+    "amsterdam": "AMS",
+    "rome": "FCO",
+    "barcelona": "BCN",
+    "madrid": "MAD",
+    "istanbul": "IST",
+    "doha": "DOH",
+    "abu dhabi": "AUH",
+    "kuala lumpur": "KUL",
+    "jakarta": "CGK",
+    "seoul": "ICN",
+    "beijing": "PEK",
+    "shanghai": "PVG",
+}
+
+# Timestamp formats seen in timetable API responses, most specific first
+_TIME_FORMATS = (
+    "%Y-%m-%dT%H:%M:%S.%f",  # ISO with microseconds
+    "%Y-%m-%dT%H:%M:%S",      # ISO without microseconds
+    "%Y-%m-%d %H:%M:%S",      # Space separated
+    "%Y-%m-%d",               # Date only
+)
+
 class TripPlanner:
     def __init__(self, aviation_api_key: str):
         self.api_key = aviation_api_key
@@ -20,52 +73,7 @@ class TripPlanner:
     
     def get_airport_code(self, city_name: str) -> Optional[str]:
         """Map city names to IATA airport codes"""
-        airport_map = {
-            # Indian cities
-            "bengaluru": "BLR", "bangalore": "BLR",
-            "mumbai": "BOM", "bombay": "BOM",
-            "delhi": "DEL", "new delhi": "DEL",
-            "chennai": "MAA", "madras": "MAA",
-            "kolkata": "CCU", "calcutta": "CCU",
-            "hyderabad": "HYD",
-            "pune": "PNQ",
-            "ahmedabad": "AMD",
-            "goa": "GOI",
-            "kochi": "COK", "cochin": "COK",
-            
-            # International
-            "london": "LHR",
-            "paris": "CDG",
-            "new york": "JFK",
-            "dubai": "DXB",
-            "singapore": "SIN",
-            "tokyo": "NRT",
-            "bangkok": "BKK",
-            "hong kong": "HKG",
-            "sydney": "SYD",
-            "los angeles": "LAX",
-            "san francisco": "SFO",
-            "chicago": "ORD",
-            "miami": "MIA",
-            "toronto": "YYZ",
-            "vancouver": "YVR",
-            "frankfurt": "FRA",
-            "amsterdam": "AMS",
-            "rome": "FCO",
-            "barcelona": "BCN",
-            "madrid": "MAD",
-            "istanbul": "IST",
-            "doha": "DOH",
-            "abu dhabi": "AUH",
-            "kuala lumpur": "KUL",
-            "jakarta": "CGK",
-            "seoul": "ICN",
-            "beijing": "PEK",
-            "shanghai": "PVG",
-        }
-        
-        city_lower = city_name.lower().strip()
-        return airport_map.get(city_lower)
+        return _AIRPORT_CODES.get(city_name.lower().strip())
     
     def parse_time(self, time_str: str) -> Optional[datetime]:
         """Parse various time formats from API"""
@@ -73,14 +81,7 @@ class TripPlanner:
             return None
         
         # Try different formats
-        formats = [
-            "%Y-%m-%dT%H:%M:%S.%f",  # ISO with microseconds
-            "%Y-%m-%dT%H:%M:%S",      # ISO without microseconds
-            "%Y-%m-%d %H:%M:%S",      # Space separated
-            "%Y-%m-%d",               # Date only
-        ]
-        
-        for fmt in formats:
+        for fmt in _TIME_FORMATS:
             try:
                 return datetime.strptime(time_str, fmt)
             except:
@@ -174,15 +175,10 @@ class TripPlanner:
         Check if direct flight exists between two airports
         """
         flights = self.fetch_flights(from_airport)
-        
-        for flight in flights:
-            arrival = flight.get("arrival", {}) or {}
-            arr_iata = arrival.get("iataCode")
-            
-            if arr_iata == to_airport:
-                return True
-        
-        return False
+        return any(
+            (flight.get("arrival") or {}).get("iataCode") == to_airport
+            for flight in flights
+        )
     
     def build_adjacency_matrix(self, cities: List[Dict]) -> List[List[bool]]:
         """